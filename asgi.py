@@ -0,0 +1,265 @@
+import asyncio
+import contextlib
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from chatbot import PROMPT_CACHE, graph_with_tools
+from config import ALLOWED_ORIGINS
+from gemini_client import GEMINI_CLIENT_POOL
+import user_data
+from utils import GROUNDING_TIMINGS, parse_messages_for_langgraph
+from streaming import astream_chat_events
+from sessions import (
+    SessionConflict,
+    create_session_store,
+    new_session,
+    update_session,
+)
+from langchain_core.messages.ai import AIMessage
+
+
+async def stats(request: Request) -> JSONResponse:
+    """Performance counters of this worker process."""
+    return JSONResponse(
+        {
+            "gemini_client_pool": GEMINI_CLIENT_POOL.checkout_stats(),
+            "grounding_timings": GROUNDING_TIMINGS.snapshot(),
+        }
+    )
+
+
+async def chat(request: Request) -> JSONResponse:
+    """Chat with the finance bot, without holding a worker thread while the LLM works."""
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data:
+        return JSONResponse({"error": "Invalid or missing JSON"}, status_code=400)
+
+    portfolio = user_data.build_portfolio(data["user_details"], data["accounts"])
+
+    # Messages
+    config = {"recursion_limit": 500}
+
+    processed_messages = parse_messages_for_langgraph(data["chatMessages"])
+
+    # Tasks spawned by the graph copy the current context, so they see this portfolio
+    with user_data.use_portfolio(portfolio):
+        state = await graph_with_tools.ainvoke(
+            {"messages": processed_messages}, config=config
+        )
+
+    # Get the latest chatbot message
+    chatbot_messages = state.get("messages", [])
+    last_message = chatbot_messages[-1] if chatbot_messages else None
+
+    if isinstance(last_message, AIMessage):
+        return JSONResponse({"response": last_message.content})
+    return JSONResponse({"error": "No valid response"}, status_code=500)
+
+
+async def chat_stream(request: Request):
+    """Chat with the finance bot, streaming its progress as Server-Sent Events."""
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data:
+        return JSONResponse({"error": "Invalid or missing JSON"}, status_code=400)
+
+    portfolio = user_data.build_portfolio(data["user_details"], data["accounts"])
+
+    # Messages
+    config = {"recursion_limit": 500}
+
+    processed_messages = parse_messages_for_langgraph(data["chatMessages"])
+
+    async def generate():
+        with user_data.use_portfolio(portfolio):
+            async for sse_event in astream_chat_events(
+                graph_with_tools, {"messages": processed_messages}, config
+            ):
+                yield sse_event
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def create_session(request: Request) -> JSONResponse:
+    """Start a session; its accounts are sent and validated only once."""
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data:
+        return JSONResponse({"error": "Invalid or missing JSON"}, status_code=400)
+
+    session = new_session(
+        data["user_details"], data["accounts"], data.get("chatMessages")
+    )
+    # The SQLite store blocks, so sessions are stored off the event loop
+    await asyncio.to_thread(request.app.state.session_store.save, session)
+
+    return JSONResponse(
+        {"session_id": session.session_id, "version": session.version},
+        status_code=201,
+    )
+
+
+async def delete_session(request: Request) -> Response:
+    await asyncio.to_thread(
+        request.app.state.session_store.delete, request.path_params["session_id"]
+    )
+    return Response(status_code=204)
+
+
+async def patch_session_accounts(request: Request) -> JSONResponse:
+    """
+    Update the accounts of a session. The body holds `upsert`, a list of
+    accounts to add or replace by id, `remove`, a list of account ids, and
+    optionally new `user_details`.
+    """
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data:
+        return JSONResponse({"error": "Invalid or missing JSON"}, status_code=400)
+
+    upsert = data.get("upsert") or []
+    remove = data.get("remove") or []
+    if not isinstance(upsert, list) or not all(
+        isinstance(account, dict) and "id" in account for account in upsert
+    ):
+        return JSONResponse(
+            {"error": "Every upserted account needs an id"}, status_code=400
+        )
+    if not isinstance(remove, list):
+        return JSONResponse(
+            {"error": "remove must be a list of account ids"}, status_code=400
+        )
+
+    # Re-applied to the latest version if the session changes meanwhile
+    try:
+        session = await asyncio.to_thread(
+            update_session,
+            request.app.state.session_store,
+            request.path_params["session_id"],
+            lambda session: session.apply_account_patch(
+                upsert, remove, data.get("user_details")
+            ),
+        )
+    except SessionConflict:
+        return JSONResponse(
+            {"error": "Session is being modified, try again"}, status_code=409
+        )
+    if session is None:
+        return JSONResponse({"error": "Unknown session"}, status_code=404)
+
+    return JSONResponse({"session_id": session.session_id, "version": session.version})
+
+
+async def session_chat(request: Request) -> JSONResponse:
+    """Chat with the finance bot; the body only holds the new `message`."""
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data or "message" not in data:
+        return JSONResponse({"error": "Invalid or missing JSON"}, status_code=400)
+
+    session_store = request.app.state.session_store
+    session_id = request.path_params["session_id"]
+    session = await asyncio.to_thread(session_store.get, session_id)
+    if session is None:
+        return JSONResponse({"error": "Unknown session"}, status_code=404)
+
+    config = {"recursion_limit": 500}
+
+    processed_messages = parse_messages_for_langgraph(
+        session.chat_messages + [{"sender": "user", "text": data["message"]}]
+    )
+
+    with user_data.use_portfolio(session.portfolio):
+        state = await graph_with_tools.ainvoke(
+            {"messages": processed_messages}, config=config
+        )
+
+    chatbot_messages = state.get("messages", [])
+    last_message = chatbot_messages[-1] if chatbot_messages else None
+
+    if not isinstance(last_message, AIMessage):
+        return JSONResponse({"error": "No valid response"}, status_code=500)
+
+    # The graph runs for a while, so the turn is appended to the latest version
+    # of the session, keeping the patches and turns saved in the meantime
+    try:
+        session = await asyncio.to_thread(
+            update_session,
+            session_store,
+            session_id,
+            lambda session: session.with_turn(data["message"], last_message.content),
+        )
+    except SessionConflict:
+        return JSONResponse(
+            {"error": "Session is being modified, try again"}, status_code=409
+        )
+    if session is None:
+        return JSONResponse({"error": "Unknown session"}, status_code=404)
+
+    return JSONResponse({"response": last_message.content})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    if PROMPT_CACHE:
+        await asyncio.to_thread(PROMPT_CACHE.start)
+    yield
+
+
+def create_asgi_app() -> Starlette:
+    app = Starlette(
+        routes=[
+            Route("/stats", stats, methods=["GET"]),
+            Route("/chat", chat, methods=["POST"]),
+            Route("/chat/stream", chat_stream, methods=["POST"]),
+            Route("/sessions", create_session, methods=["POST"]),
+            Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+            Route(
+                "/sessions/{session_id}/accounts",
+                patch_session_accounts,
+                methods=["PATCH"],
+            ),
+            Route("/sessions/{session_id}/chat", session_chat, methods=["POST"]),
+        ],
+        lifespan=lifespan,
+        middleware=[
+            Middleware(
+                CORSMiddleware,
+                allow_origins=ALLOWED_ORIGINS,
+                allow_methods=["POST", "PATCH", "DELETE", "OPTIONS"],
+                allow_headers=["Content-Type"],
+                allow_credentials=True,
+            )
+        ],
+    )
+    app.state.session_store = create_session_store()
+    return app
+
+
+# Served with an ASGI server, e.g. `uvicorn asgi:application`
+application = create_asgi_app()
@@ -6,12 +6,19 @@ from langgraph.graph.message import add_messages
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages.ai import AIMessage
 from google.api_core import retry
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from typing import Annotated, Literal
 from typing_extensions import TypedDict
 from tools import *
 from utils import *
 from data_models import *
+from history import compact_history
+from fast_path import FAST_PATH_ENABLED, fast_path_node
+from prompt_cache import CachedPrefix
+from tool_router import ToolRouter
 from dotenv import load_dotenv
+import asyncio
+import functools
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -27,6 +34,11 @@ if not hasattr(genai.models.Models.generate_content, "__wrapped__"):
         genai.models.Models.generate_content
     )
 
+if not hasattr(genai.models.AsyncModels.generate_content, "__wrapped__"):
+    genai.models.AsyncModels.generate_content = retry.AsyncRetry(
+        predicate=is_retriable
+    )(genai.models.AsyncModels.generate_content)
+
 
 class ChatState(TypedDict):
     """State"""
@@ -79,9 +91,28 @@ def maybe_route_to_tools(state: ChatState) -> str:
     return "human"
 
 
+def _turn_model_and_input(messages, cache_name):
+    """
+    Returns the chat model and input of a turn. With a prompt cache, every tool
+    is bound and the system instruction and the tool declarations are read from
+    the cache instead of being sent. Without one, the tool router binds only the
+    tools relevant to the user message, when it finds any.
+    """
+    if cache_name:
+        return llm.bind(cached_content=cache_name), compact_history(messages)
+    routed_tools = TOOL_ROUTER.select_for_messages(messages) if TOOL_ROUTER else None
+    if routed_tools is not None:
+        model = _llm_with_tool_subset(tuple(tool.name for tool in routed_tools))
+        return model, [FINANCEBOT_SYSINT] + compact_history(messages)
+    return llm_with_tools, [FINANCEBOT_SYSINT] + compact_history(messages)
+
+
 def chatbot_with_tools(state: ChatState) -> ChatState:
     messages = state["messages"]
-    new_output = llm_with_tools.invoke([FINANCEBOT_SYSINT] + messages)
+    model, model_input = _turn_model_and_input(
+        messages, PROMPT_CACHE.name() if PROMPT_CACHE else None
+    )
+    new_output = model.invoke(model_input)
 
     # If current model response does NOT have tool_calls → it's a final message
     is_final_response = not (
@@ -94,6 +125,25 @@ def chatbot_with_tools(state: ChatState) -> ChatState:
     }
 
 
+async def achatbot_with_tools(state: ChatState) -> ChatState:
+    """Async version of `chatbot_with_tools`, used by `graph_with_tools.ainvoke`."""
+    messages = state["messages"]
+    # The cache is refreshed in the background, so reading its name does not block
+    model, model_input = _turn_model_and_input(
+        messages, PROMPT_CACHE.current_name() if PROMPT_CACHE else None
+    )
+    new_output = await model.ainvoke(model_input)
+
+    is_final_response = not (
+        hasattr(new_output, "tool_calls") and new_output.tool_calls
+    )
+
+    return state | {
+        "messages": messages + [new_output],
+        "finished": is_final_response,
+    }
+
+
 def human_node(state: ChatState) -> ChatState:
     """Display the last model message to the user, and receive the user's input."""
 
@@ -107,12 +157,23 @@ def human_node(state: ChatState) -> ChatState:
     return state | {"messages": [("user", user_input)]}
 
 
-# Auto-tools will be invoked automatically by the ToolNode
-auto_tools = [
+# Tools that are not about one type of account
+GENERAL_TOOLS = [
     search_and_answer,
     get_user_details,
     get_tickers_info,
     identify_better_tickers,
+    optimize_spending_in_a_category,
+    optimize_spending_with_cc_all_categories,
+    get_better_cards_for_category,
+    optimize_financial_plan,
+    how_can_I_make_X_money_in_Y_months,
+    how_can_save_X_money_in_Y_months,
+]
+
+# The tools of every account type before ACCOUNT_TOOLS took their place. They
+# still run when called, and LEGACY_ACCOUNT_TOOLS=on binds them to the LLM too.
+LEGACY_ACCOUNT_TOOLS = [
     extract_unique_tickers_investment_accounts,
     summary_of_investment_accounts,
     get_investment_account,
@@ -136,9 +197,6 @@ auto_tools = [
     summary_of_credit_cards,
     get_all_credit_cards,
     get_credit_card,
-    optimize_spending_in_a_category,
-    optimize_spending_with_cc_all_categories,
-    get_better_cards_for_category,
     summary_of_cheking_accounts,
     get_all_checking_accounts,
     get_checking_account,
@@ -157,12 +215,50 @@ auto_tools = [
     summary_of_other_accounts,
     get_all_other_accounts,
     get_other_account,
-    optimize_financial_plan,
-    how_can_I_make_X_money_in_Y_months,
-    how_can_save_X_money_in_Y_months,
 ]
 
-tool_node = ToolNode(auto_tools)
+# Auto-tools will be invoked automatically by the ToolNode
+auto_tools = GENERAL_TOOLS + ACCOUNT_TOOLS
+if os.getenv("LEGACY_ACCOUNT_TOOLS", "off").lower() == "on":
+    auto_tools += LEGACY_ACCOUNT_TOOLS
+
+
+class BoundedToolNode(ToolNode):
+    """
+    A ToolNode that runs the tool calls of one AIMessage concurrently, with at
+    most `max_concurrency` of them in flight at once.
+
+    The ToolMessages are returned in the order of the tool calls, no matter which
+    call finishes first.
+    """
+
+    def __init__(self, tools, *, max_concurrency: int = 8, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max_concurrency
+
+    def _func(self, input, config: RunnableConfig, *, store):
+        # The thread pool running the calls is sized from the config
+        config = config | {"max_concurrency": self.max_concurrency}
+        return super()._func(input, config, store=store)
+
+    async def _afunc(self, input, config: RunnableConfig, *, store):
+        tool_calls, input_type = self._parse_input(input, store)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(call):
+            async with semaphore:
+                return await self._arun_one(call, input_type, config)
+
+        outputs = await asyncio.gather(*(run_one(call) for call in tool_calls))
+
+        return self._combine_tool_outputs(outputs, input_type)
+
+
+# Tool calls that Gemini emits together in one turn run in parallel
+tool_node = BoundedToolNode(
+    GENERAL_TOOLS + ACCOUNT_TOOLS + LEGACY_ACCOUNT_TOOLS,
+    max_concurrency=int(os.getenv("TOOL_MAX_CONCURRENCY", "8")),
+)
 
 
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GOOGLE_API_KEY)
@@ -170,10 +266,48 @@ llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GOOGLE_API
 # The LLM needs to know about all of the tools, so specify everything here.
 llm_with_tools = llm.bind_tools(auto_tools)
 
+# Routes turns sent without the prompt cache to the tools relevant to the user
+# message, see ToolRouter; with the cache, the cached declarations of every tool
+# are cheaper than sending a subset. The account tools take the account type as
+# an argument, so their descriptions do not match messages about one type; they
+# are small enough to always bind.
+# Set TOOL_ROUTER=off to bind every tool on every turn.
+TOOL_ROUTER = (
+    ToolRouter(
+        auto_tools,
+        always=("search_and_answer", "get_user_details")
+        + tuple(tool.name for tool in ACCOUNT_TOOLS),
+    )
+    if os.getenv("TOOL_ROUTER", "on").lower() != "off"
+    else None
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _llm_with_tool_subset(tool_names: tuple[str, ...]):
+    return llm.bind_tools([tool_node.tools_by_name[name] for name in tool_names])
+
+
+# The system instruction and the tool declarations are the same on every turn and
+# make up most of its input tokens, so they are kept in a Gemini context cache.
+# Set PROMPT_CACHE=off to send them with every turn instead.
+PROMPT_CACHE = (
+    CachedPrefix(
+        llm.model,
+        FINANCEBOT_SYSINT[1],
+        auto_tools,
+        ttl=int(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600")),
+    )
+    if os.getenv("PROMPT_CACHE", "on").lower() != "off"
+    else None
+)
+
 graph_builder = StateGraph(ChatState)
 
 # Nodes
-graph_builder.add_node("chatbot", chatbot_with_tools)
+graph_builder.add_node(
+    "chatbot", RunnableLambda(chatbot_with_tools, afunc=achatbot_with_tools)
+)
 graph_builder.add_node("human", human_node)
 graph_builder.add_node("tools", tool_node)
 
@@ -185,5 +319,11 @@ graph_builder.add_conditional_edges("human", maybe_exit_human_node)
 # Tools (both kinds) always route back to chat afterwards.
 graph_builder.add_edge("tools", "chatbot")
 
-graph_builder.add_edge(START, "chatbot")
+if FAST_PATH_ENABLED:
+    # Simple lookups are answered from the portfolio, without calling the LLM
+    graph_builder.add_node("fast_path", fast_path_node)
+    graph_builder.add_conditional_edges("fast_path", maybe_exit_human_node)
+    graph_builder.add_edge(START, "fast_path")
+else:
+    graph_builder.add_edge(START, "chatbot")
 graph_with_tools = graph_builder.compile()
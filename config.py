@@ -0,0 +1,6 @@
+# Origins allowed to call the API from a browser, shared by the WSGI and ASGI apps
+ALLOWED_ORIGINS = [
+    "https://9000-firebase-studio-1748025806552.cluster-f4iwdviaqvc2ct6pgytzw4xqy4.cloudworkstations.dev",
+    "https://sathwick-reddy-m.github.io/FinanceBot-Frontend",
+    "https://sathwick-reddy-m.github.io",
+]
@@ -70,6 +70,15 @@ class TickerInformation(BaseModel):
         )
 
 
+class TickerNews(BaseModel):
+    ticker: str = Field(..., description="Unique stock symbol")
+    company_name: str = Field("", description="Full name of the company")
+    summary_of_latest_market_news: str = Field(
+        ...,
+        description="1 or 2 paragraphs summary of latest market news related to this ticker",
+    )
+
+
 class AssetDistribution(BaseModel):
     ticker: str = Field(..., description="Unique security symbol")
     quantity: float = Field(..., description="Number of shares owned")
@@ -324,6 +333,7 @@ class Roth401K(BaseModel):
 class BillingCycleTransaction(BaseModel):
     amount: float
     category: str
+    date: Optional[str] = None  # YYYY-MM-DD when known; other formats are read as unknown
 
     def __str__(self):
         return f'{"Credit" if self.amount > 0 else "Debit"} of ${abs(self.amount):.2f} in category {self.category}'
@@ -0,0 +1,242 @@
+import os
+import re
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+import user_data
+from utils import get_summary_of_payroll_accounts
+
+# Set FAST_PATH=off to send every message through the LLM
+FAST_PATH_ENABLED = os.getenv("FAST_PATH", "on").lower() != "off"
+
+# How users name each account type, longest first within a type
+_ACCOUNT_TYPE_PHRASES = {
+    "Credit Card": ("credit cards", "credit card", "cards"),
+    "Checking": ("checking accounts", "checking account", "checking"),
+    "Savings": (
+        "savings accounts",
+        "savings account",
+        "saving accounts",
+        "saving account",
+        "savings",
+    ),
+    "Loan": ("loans", "loan"),
+    "Payroll": ("payroll accounts", "payrolls", "payroll", "paychecks", "paycheck"),
+    "Investment": (
+        "investment accounts",
+        "investment account",
+        "brokerage accounts",
+        "brokerage account",
+    ),
+    "Traditional IRA": ("traditional iras", "traditional ira"),
+    "Roth IRA": ("roth iras", "roth ira"),
+    "Roth 401k": ("roth 401ks", "roth 401k"),
+    "Retirement 401k": ("401ks", "401k"),
+    "HSA": ("health savings accounts", "health savings account", "hsas", "hsa"),
+    "Other": ("other accounts",),
+}
+
+# How answers name each account type, in the singular and the plural
+_ACCOUNT_TYPE_NOUNS = {
+    "Investment": ("investment account", "investment accounts"),
+    "Credit Card": ("credit card", "credit cards"),
+    "Checking": ("checking account", "checking accounts"),
+    "Savings": ("savings account", "savings accounts"),
+    "Loan": ("loan", "loans"),
+    "Payroll": ("payroll account", "payroll accounts"),
+    "Traditional IRA": ("traditional IRA", "traditional IRAs"),
+    "Roth IRA": ("Roth IRA", "Roth IRAs"),
+    "Retirement 401k": ("401(k) account", "401(k) accounts"),
+    "Roth 401k": ("Roth 401(k) account", "Roth 401(k) accounts"),
+    "HSA": ("HSA", "HSAs"),
+    "Other": ("other account", "other accounts"),
+}
+
+_PHRASE_TYPES = {
+    phrase: account_type
+    for account_type, phrases in _ACCOUNT_TYPE_PHRASES.items()
+    for phrase in phrases
+}
+# Longest phrases first, so "roth 401k" wins over "401k"
+_TYPE = "(?P<type>{})".format(
+    "|".join(
+        re.escape(phrase) for phrase in sorted(_PHRASE_TYPES, key=len, reverse=True)
+    )
+)
+
+_DEBT_TYPES = "|".join(
+    re.escape(phrase)
+    for account_type in ("Credit Card", "Loan")
+    for phrase in _ACCOUNT_TYPE_PHRASES[account_type]
+)
+
+# Every pattern must match the whole normalized message; anything else, e.g. a
+# question with a condition or a follow-up, goes to the LLM
+_LIST_PATTERNS = [
+    rf"(?:list|show|show me|what are|which are|give me) (?:all )?(?:of )?my {_TYPE}",
+    rf"(?:what|which) {_TYPE} do i have",
+    rf"do i have any {_TYPE}",
+]
+_BALANCE_PATTERNS = [
+    rf"(?:what is|show|show me|tell me) (?:the )?(?:total )?(?:balance|balances) (?:of|on|in) my {_TYPE}",
+    rf"(?:what is|show|show me|tell me) my (?:total )?{_TYPE} (?:balance|balances)",
+    # Only cards and loans carry debt
+    rf"(?:what is|show|show me|tell me) my (?:total )?(?P<type>{_DEBT_TYPES}) debt",
+    rf"how much do i owe on my {_TYPE}",
+    rf"how much (?:money )?do i have in my {_TYPE}",
+]
+_PAYROLL_SUMMARY_PATTERNS = [
+    rf"(?:summarize|summary of|show me a summary of|give me a summary of) my {_TYPE}",
+    # Not "income": it also counts the income of other accounts
+    r"what is my (?:annual )?salary",
+]
+_INTENTS = [
+    (intent, re.compile(pattern))
+    for intent, patterns in (
+        ("list", _LIST_PATTERNS),
+        ("balance", _BALANCE_PATTERNS),
+        ("payroll_summary", _PAYROLL_SUMMARY_PATTERNS),
+    )
+    for pattern in patterns
+]
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"\bwhat's\b", "what is", text)
+    text = re.sub(r"\b(?:please|can you|could you)\b", " ", text)
+    # 401(k) -> 401k, and no punctuation around the words
+    text = re.sub(r"[()?!.,]", "", text)
+    return " ".join(text.split())
+
+
+def match_intent(text: str) -> tuple[str, str | None] | None:
+    """
+    Returns the (intent, account type) a message asks for, or None when it is
+    not one of the simple lookups this module answers. The account type is None
+    for intents that do not name one.
+    """
+    normalized = _normalize(text)
+    for intent, pattern in _INTENTS:
+        match = pattern.fullmatch(normalized)
+        if match is not None:
+            phrase = match.groupdict().get("type")
+            return intent, _PHRASE_TYPES[phrase] if phrase else None
+    return None
+
+
+def _money(amount: float) -> str:
+    return f"-${-amount:,.2f}" if amount < 0 else f"${amount:,.2f}"
+
+
+def _noun(account_type: str, count: int) -> str:
+    singular, plural = _ACCOUNT_TYPE_NOUNS[account_type]
+    return singular if count == 1 else plural
+
+
+def _list_answer(account_type: str, accounts) -> str:
+    if not accounts:
+        return f"You don't have any {_noun(account_type, 0)}."
+    lines = [f"You have {len(accounts)} {_noun(account_type, len(accounts))}:"]
+    lines += [f"- {account.name} (ID {account.id})" for account in accounts]
+    return "\n".join(lines)
+
+
+def _balance_answer(account_type: str, accounts) -> str | None:
+    if not accounts:
+        return f"You don't have any {_noun(account_type, 0)}."
+    noun = _noun(account_type, len(accounts))
+
+    if account_type == "Credit Card":
+        lines = [
+            f"You owe {_money(sum(card.outstanding_debt for card in accounts))} "
+            f"in total on your {noun}, with "
+            f"{_money(sum(card.current_limit for card in accounts))} of available credit:"
+        ]
+        lines += [
+            f"- {card.name}: {_money(card.outstanding_debt)} owed, "
+            f"{_money(card.current_limit)} available of a {_money(card.total_limit)} limit"
+            for card in accounts
+        ]
+    elif account_type == "Loan":
+        lines = [
+            f"You owe {_money(sum(loan.outstanding_balance for loan in accounts))} "
+            f"in total on your {noun}:"
+        ]
+        lines += [
+            f"- {loan.name}: {_money(loan.outstanding_balance)} outstanding, "
+            f"next payment due {loan.payment_due_date}"
+            for loan in accounts
+        ]
+    elif account_type in ("Checking", "Savings"):
+        lines = [
+            f"Your {noun} {'holds' if len(accounts) == 1 else 'hold'} "
+            f"{_money(sum(account.current_amount for account in accounts))} in total:"
+        ]
+        lines += [
+            f"- {account.name}: {_money(account.current_amount)}"
+            for account in accounts
+        ]
+    else:
+        # Balances of the other types need more context, e.g. market data
+        return None
+    return "\n".join(lines)
+
+
+def _payroll_summary_answer(accounts) -> str:
+    if not accounts:
+        return "You don't have any payroll accounts."
+    summary = get_summary_of_payroll_accounts()
+    withheld = summary.total_withheld
+    return "\n".join(
+        [
+            "Here is a summary of your payroll:",
+            f"- Annual income: {_money(summary.total_annual_income)}",
+            f"- Net income: {_money(summary.total_net_income)}",
+            f"- Bonus income: {_money(summary.total_bonus_income)}",
+            f"- Withheld: {_money(withheld.federal)} federal, "
+            f"{_money(withheld.state)} state, "
+            f"{_money(withheld.social_security)} Social Security, "
+            f"{_money(withheld.medicare)} Medicare and "
+            f"{_money(withheld.other)} other deductions",
+            f"- Most recent year-to-date income: {_money(summary.most_recent_ytd_income)}",
+        ]
+    )
+
+
+def answer_simple_lookup(messages: list[BaseMessage]) -> str | None:
+    """
+    Answers the last user message from the active portfolio when it is a simple
+    lookup (listing the accounts of a type, the balance of credit cards, loans,
+    checking or savings accounts, or the payroll summary), without calling the LLM.
+
+    Returns None when the message is anything else, or the last message is not
+    from the user, and the graph should answer it.
+    """
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return None
+    intent = match_intent(str(messages[-1].content))
+    if intent is None:
+        return None
+
+    intent, account_type = intent
+    portfolio = user_data.get_portfolio()
+    if intent == "payroll_summary":
+        if account_type not in (None, "Payroll"):
+            return None
+        return _payroll_summary_answer(portfolio.payrolls)
+
+    accounts = getattr(portfolio, user_data.ACCOUNT_TYPES[account_type].family)
+    if intent == "list":
+        return _list_answer(account_type, accounts)
+    return _balance_answer(account_type, accounts)
+
+
+def fast_path_node(state):
+    """
+    Graph node answering simple lookups before the chatbot, see `answer_simple_lookup`.
+    """
+    answer = answer_simple_lookup(state["messages"])
+    if answer is None:
+        return {"finished": False}
+    return {"messages": [AIMessage(content=answer)], "finished": True}
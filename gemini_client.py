@@ -0,0 +1,136 @@
+import contextlib
+import os
+import queue
+import threading
+
+from google import genai
+
+
+class GeminiClientPool:
+    """
+    A thread-safe pool of reusable `genai.Client` instances.
+
+    Every client keeps its own keep-alive HTTP connections, so handing the same
+    clients out again avoids paying connection setup and the TLS handshake on
+    every Gemini call. At most `size` clients are created; callers block until a
+    client is returned once all of them are in use.
+
+    Async callers do not check clients out: they share one client, whose async
+    HTTP connection pool is safe to use from many coroutines at once, so the
+    number of concurrent async calls is not limited by `size`.
+    """
+
+    def __init__(self, size: int = 8, api_key: str | None = None):
+        self.size = size
+        self.api_key = api_key
+        # LIFO, so the most recently used client (and its warm connections) goes out first
+        self._idle: queue.LifoQueue[genai.Client] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._acquired = 0
+        self._reused = 0
+        self._waited = 0
+        self._shared: genai.Client | None = None
+        self._shared_uses = 0
+
+    def _create_client(self) -> genai.Client:
+        return genai.Client(api_key=self.api_key or os.getenv("GOOGLE_API_KEY"))
+
+    def acquire(self) -> genai.Client:
+        with self._lock:
+            self._acquired += 1
+            try:
+                client = self._idle.get_nowait()
+                self._reused += 1
+                return client
+            except queue.Empty:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    self._waited += 1
+                    create = False
+
+        if create:
+            try:
+                return self._create_client()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        client = self._idle.get()
+        with self._lock:
+            self._reused += 1
+        return client
+
+    def release(self, client: genai.Client):
+        self._idle.put(client)
+
+    @contextlib.contextmanager
+    def client(self):
+        """
+        Checks a client out of the pool for the duration of the block.
+        """
+        client = self.acquire()
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def shared_client(self) -> genai.Client:
+        """
+        Returns the client shared by async callers, creating it on first use.
+        """
+        with self._lock:
+            if self._shared is None:
+                self._shared = self._create_client()
+            self._shared_uses += 1
+            return self._shared
+
+    @contextlib.asynccontextmanager
+    async def aclient(self):
+        """
+        Async version of `client`. It yields the client shared by async callers,
+        see `shared_client`, without waiting; use its `aio` interface.
+        """
+        yield self.shared_client()
+
+    def checkout_stats(self) -> dict[str, int]:
+        """
+        Returns how often clients were checked out of the pool, and how many of
+        those checkouts reused an existing client (and its warm connections) or
+        had to wait for one. These count clients, not HTTP connections, which
+        every client manages on its own.
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "clients_created": self._created,
+                "clients_idle": self._idle.qsize(),
+                "checkouts": self._acquired,
+                "checkouts_reusing_client": self._reused,
+                "checkouts_waiting_for_client": self._waited,
+                "async_shared_client_uses": self._shared_uses,
+            }
+
+
+# Shared by every Gemini call made by this process
+GEMINI_CLIENT_POOL = GeminiClientPool(
+    size=int(os.getenv("GEMINI_CLIENT_POOL_SIZE", "8"))
+)
+
+
+def gemini_client():
+    """
+    Checks a client out of the shared pool, e.g. `with gemini_client() as client: ...`.
+    """
+    return GEMINI_CLIENT_POOL.client()
+
+
+def async_gemini_client():
+    """
+    Checks a client out of the shared pool for async code, e.g.
+    `async with async_gemini_client() as client: await client.aio...`.
+    """
+    return GEMINI_CLIENT_POOL.aclient()
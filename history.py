@@ -0,0 +1,118 @@
+import os
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+# Budget for the conversation history sent to the LLM on every turn
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "24000"))
+# Older tool results are cut down to this many characters
+HISTORY_TOOL_MESSAGE_CHARS = int(os.getenv("HISTORY_TOOL_MESSAGE_CHARS", "600"))
+# Number of user turns that are always sent verbatim
+HISTORY_KEEP_RECENT_TURNS = int(os.getenv("HISTORY_KEEP_RECENT_TURNS", "2"))
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """
+    Rough token count of a message, about 4 characters per token.
+    """
+    chars = len(str(message.content))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        chars += len(tool_call["name"]) + len(str(tool_call["args"]))
+    return chars // 4 + 1
+
+
+def _split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    # A turn starts at a user message and holds the bot replies and tool
+    # calls / results that follow it, so dropping whole turns never separates
+    # a tool call from its result
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _truncate_tool_message(message: ToolMessage, max_chars: int) -> ToolMessage:
+    content = str(message.content)
+    if len(content) <= max_chars:
+        return message
+    return message.model_copy(
+        update={
+            "content": content[:max_chars]
+            + f"\n... [truncated {len(content) - max_chars} characters, call the tool again for the full result]"
+        }
+    )
+
+
+def _latest_tool_round(turn: list[BaseMessage]) -> int:
+    # Index of the last model message calling tools; the tool results after it
+    # are the ones the model is about to read
+    for index in range(len(turn) - 1, -1, -1):
+        message = turn[index]
+        if isinstance(message, AIMessage) and message.tool_calls:
+            return index
+    return len(turn)
+
+
+def compact_history(
+    messages: list[BaseMessage],
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+    tool_message_chars: int = HISTORY_TOOL_MESSAGE_CHARS,
+    keep_recent_turns: int = HISTORY_KEEP_RECENT_TURNS,
+) -> list[BaseMessage]:
+    """
+    Shrinks the conversation history to fit a token budget before an LLM call.
+
+    The last `keep_recent_turns` user turns are kept verbatim, except for the
+    current turn: its tool results from earlier tool rounds are truncated like
+    those of older turns, and only the latest round is kept whole. Tool results
+    of older turns are truncated to `tool_message_chars` characters, and if the
+    history is still over `token_budget`, the oldest turns are dropped.
+
+    Args:
+        messages: The conversation history, oldest first.
+        token_budget: The approximate number of tokens the history may use.
+        tool_message_chars: The maximum length of an older tool result.
+        keep_recent_turns: The number of most recent user turns never compacted.
+
+    Returns:
+        The compacted history; `messages` itself is not modified.
+    """
+    if sum(estimate_tokens(message) for message in messages) <= token_budget:
+        return messages
+
+    turns = _split_turns(messages)
+    split = max(len(turns) - keep_recent_turns, 0)
+    old_turns = [
+        [
+            (
+                _truncate_tool_message(message, tool_message_chars)
+                if isinstance(message, ToolMessage)
+                else message
+            )
+            for message in turn
+        ]
+        for turn in turns[:split]
+    ]
+    recent_turns = turns[split:]
+    if recent_turns:
+        current_turn = recent_turns[-1]
+        latest_round = _latest_tool_round(current_turn)
+        recent_turns[-1] = [
+            (
+                _truncate_tool_message(message, tool_message_chars)
+                if isinstance(message, ToolMessage) and index < latest_round
+                else message
+            )
+            for index, message in enumerate(current_turn)
+        ]
+
+    total = sum(
+        estimate_tokens(message)
+        for turn in old_turns + recent_turns
+        for message in turn
+    )
+    while old_turns and total > token_budget:
+        total -= sum(estimate_tokens(message) for message in old_turns.pop(0))
+
+    return [message for turn in old_turns + recent_turns for message in turn]
@@ -0,0 +1,108 @@
+import numpy as np
+
+
+class HoldingsMatrix:
+    """
+    The positions of a set of accounts as an accounts x tickers matrix of share
+    quantities, and a matching matrix of total cost (quantity x average cost basis).
+
+    Row `i` belongs to `account_ids[i]` and column `j` to `tickers[j]`; tickers are
+    upper-cased and kept in the order they first appear. The cross-account view
+    sums the rows; per-account views select some of them.
+    """
+
+    def __init__(
+        self,
+        account_ids: list[str],
+        tickers: list[str],
+        quantities: np.ndarray,
+        costs: np.ndarray,
+    ):
+        self.account_ids = account_ids
+        self.tickers = tickers
+        self.quantities = quantities
+        self.costs = costs
+
+    @classmethod
+    def from_accounts(cls, accounts) -> "HoldingsMatrix":
+        """
+        Builds the matrix from accounts with an `asset_distribution`, e.g.
+        InvestmentAccount or HSAAccount.
+        """
+        ticker_columns: dict[str, int] = {}
+        rows, columns, quantities, cost_bases = [], [], [], []
+
+        for row, account in enumerate(accounts):
+            for asset in account.asset_distribution:
+                ticker = asset.ticker.upper()
+                rows.append(row)
+                columns.append(ticker_columns.setdefault(ticker, len(ticker_columns)))
+                quantities.append(asset.quantity)
+                cost_bases.append(asset.average_cost_basis)
+
+        quantities = np.array(quantities, dtype=np.float64)
+        shape = (len(accounts), len(ticker_columns))
+        position = (
+            np.array(rows, dtype=np.intp),
+            np.array(columns, dtype=np.intp),
+        )
+
+        # Accumulated position by position, so an account holding the same ticker
+        # twice adds up in one cell
+        quantity_matrix = np.zeros(shape)
+        np.add.at(quantity_matrix, position, quantities)
+        cost_matrix = np.zeros(shape)
+        np.add.at(
+            cost_matrix, position, np.array(cost_bases, dtype=np.float64) * quantities
+        )
+
+        return cls(
+            [account.id for account in accounts],
+            list(ticker_columns),
+            quantity_matrix,
+            cost_matrix,
+        )
+
+    def _rows(self, account_ids: list[str] | None) -> slice | list[int]:
+        if account_ids is None:
+            return slice(None)
+        return [self.account_ids.index(account_id) for account_id in account_ids]
+
+    def total_quantities(self, account_ids: list[str] | None = None) -> np.ndarray:
+        """
+        Returns the quantity held of every ticker, across the given accounts (all
+        of them by default).
+        """
+        return self.quantities[self._rows(account_ids)].sum(axis=0)
+
+    def average_cost_bases(self, account_ids: list[str] | None = None) -> np.ndarray:
+        """
+        Returns the quantity-weighted average cost basis of every ticker, across the
+        given accounts (all of them by default); 0 for tickers not held.
+        """
+        rows = self._rows(account_ids)
+        quantities = self.quantities[rows].sum(axis=0)
+        costs = self.costs[rows].sum(axis=0)
+        return np.divide(
+            costs, quantities, out=np.zeros_like(costs), where=quantities > 0
+        )
+
+    def unrealized_pnl(
+        self,
+        prices: np.ndarray,
+        account_ids: list[str] | None = None,
+        cost_bases: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Returns the unrealized gain (or loss, when negative) of every ticker at the
+        given prices, aligned with `tickers`, across the given accounts.
+
+        Args:
+            prices: The current price of every ticker, aligned with `tickers`.
+            account_ids: The accounts to include; all of them by default.
+            cost_bases: The cost bases to measure from; by default the weighted
+                        average cost bases of the same accounts.
+        """
+        if cost_bases is None:
+            cost_bases = self.average_cost_bases(account_ids)
+        return self.total_quantities(account_ids) * (prices - cost_bases)
@@ -1,12 +1,20 @@
 import os
-import threading
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from chatbot import graph_with_tools
+from config import ALLOWED_ORIGINS
+from gemini_client import GEMINI_CLIENT_POOL
 from data_models import *
 import user_data
-from utils import parse_messages_for_langgraph
+from utils import GROUNDING_TIMINGS, parse_messages_for_langgraph
+from streaming import stream_chat_events
+from sessions import (
+    SessionConflict,
+    create_session_store,
+    new_session,
+    update_session,
+)
 from langchain_core.messages.ai import AIMessage
 
 
@@ -17,14 +25,15 @@ def create_app() -> Flask:
         app,
         resources={
             r"/chat": {
-                "origins": [
-                    "https://9000-firebase-studio-1748025806552.cluster-f4iwdviaqvc2ct6pgytzw4xqy4.cloudworkstations.dev",
-                    "https://sathwick-reddy-m.github.io/FinanceBot-Frontend",
-                    "https://sathwick-reddy-m.github.io",
-                ],
+                "origins": ALLOWED_ORIGINS,
                 "methods": ["POST", "OPTIONS"],
                 "allow_headers": ["Content-Type"],
             },
+            r"/sessions*": {
+                "origins": ALLOWED_ORIGINS,
+                "methods": ["POST", "PATCH", "DELETE", "OPTIONS"],
+                "allow_headers": ["Content-Type"],
+            },
         },
         supports_credentials=True,
     )
@@ -36,7 +45,17 @@ def create_app() -> Flask:
     else:
         app.config.update(DEBUG=False)
 
-    _account_setup_lock = threading.Lock()
+    session_store = create_session_store()
+
+    @app.route("/stats", methods=["GET"])
+    def stats():
+        """Performance counters of this worker process."""
+        return jsonify(
+            {
+                "gemini_client_pool": GEMINI_CLIENT_POOL.checkout_stats(),
+                "grounding_timings": GROUNDING_TIMINGS.snapshot(),
+            }
+        )
 
     @app.route("/chat", methods=["POST"])
     def chat():
@@ -46,93 +65,18 @@ def create_app() -> Flask:
         if not data:
             return jsonify({"error": "Invalid or missing JSON"}), 400
 
-        with _account_setup_lock:
-            user_data.USER_DETAILS = UserDetails(**data["user_details"])
-
-            accounts = data["accounts"]
-            user_data.INVESTMENT_ACCOUNTS = []
-            user_data.CREDIT_CARDS = []
-            user_data.CHECKING_ACCOUNTS = []
-            user_data.SAVING_ACCOUNTS = []
-            user_data.LOANS = []
-            user_data.PAYROLLS = []
-            user_data.TRADITIONAL_IRAS = []
-            user_data.ROTH_IRAS = []
-            user_data.RETIREMENT_401KS = []
-            user_data.ROTH_401KS = []
-            user_data.HSA_ACCOUNTS = []
-            user_data.OTHER_ACCOUNTS = []
-
-            for account in accounts:
-                account_type = account["type"]
-                if account_type == "Investment":
-                    user_data.INVESTMENT_ACCOUNTS.append(InvestmentAccount(**account))
-                elif account_type == "Credit Card":
-                    user_data.CREDIT_CARDS.append(CreditCard(**account))
-                elif account_type == "Checking":
-                    user_data.CHECKING_ACCOUNTS.append(
-                        CheckingOrSavingsAccount(**account)
-                    )
-                elif account_type == "Savings":
-                    user_data.SAVING_ACCOUNTS.append(
-                        CheckingOrSavingsAccount(**account)
-                    )
-                elif account_type == "Loan":
-                    user_data.LOANS.append(Loan(**account))
-                elif account_type == "Payroll":
-                    user_data.PAYROLLS.append(Payroll(**account))
-                elif account_type == "Traditional IRA":
-                    user_data.TRADITIONAL_IRAS.append(TraditionalIRA(**account))
-                elif account_type == "Roth IRA":
-                    user_data.ROTH_IRAS.append(RothIRA(**account))
-                elif account_type == "Retirement 401k":
-                    user_data.RETIREMENT_401KS.append(Retirement401K(**account))
-                elif account_type == "Roth 401k":
-                    user_data.ROTH_401KS.append(Roth401K(**account))
-                elif account_type == "HSA":
-                    user_data.HSA_ACCOUNTS.append(HSAAccount(**account))
-                elif account_type == "Other":
-                    user_data.OTHER_ACCOUNTS.append(OtherAccount(**account))
-
-            user_data.INVESTMENT_ACCOUNTS_DICT = {
-                account.id: account for account in user_data.INVESTMENT_ACCOUNTS
-            }
-            user_data.CREDIT_CARDS_DICT = {
-                card.id: card for card in user_data.CREDIT_CARDS
-            }
-            user_data.CHECKING_ACCOUNTS_DICT = {
-                account.id: account for account in user_data.CHECKING_ACCOUNTS
-            }
-            user_data.SAVING_ACCOUNTS_DICT = {
-                account.id: account for account in user_data.SAVING_ACCOUNTS
-            }
-            user_data.LOANS_DICT = {loan.id: loan for loan in user_data.LOANS}
-            user_data.PAYROLLS_DICT = {
-                payroll.id: payroll for payroll in user_data.PAYROLLS
-            }
-            user_data.TRADITIONAL_IRAS_DICT = {
-                ira.id: ira for ira in user_data.TRADITIONAL_IRAS
-            }
-            user_data.ROTH_IRAS_DICT = {ira.id: ira for ira in user_data.ROTH_IRAS}
-            user_data.RETIREMENT_401KS_DICT = {
-                account.id: account for account in user_data.RETIREMENT_401KS
-            }
-            user_data.ROTH_401KS_DICT = {
-                account.id: account for account in user_data.ROTH_401KS
-            }
-            user_data.HSA_ACCOUNTS_DICT = {
-                account.id: account for account in user_data.HSA_ACCOUNTS
-            }
-            user_data.OTHER_ACCOUNTS_DICT = {
-                account.id: account for account in user_data.OTHER_ACCOUNTS
-            }
+        portfolio = user_data.build_portfolio(data["user_details"], data["accounts"])
 
         # Messages
         config = {"recursion_limit": 500}
 
         processed_messages = parse_messages_for_langgraph(data["chatMessages"])
 
-        state = graph_with_tools.invoke({"messages": processed_messages}, config=config)
+        # The portfolio is request scoped, so concurrent chats do not need a lock
+        with user_data.use_portfolio(portfolio):
+            state = graph_with_tools.invoke(
+                {"messages": processed_messages}, config=config
+            )
 
         # Get the latest chatbot message
         chatbot_messages = state.get("messages", [])
@@ -142,6 +86,139 @@ def create_app() -> Flask:
             return jsonify({"response": last_message.content})
         return jsonify({"error": "No valid response"}), 500
 
+    @app.route("/chat/stream", methods=["POST"])
+    def chat_stream():
+        """Chat with the finance bot, streaming its progress as Server-Sent Events."""
+
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Invalid or missing JSON"}), 400
+
+        portfolio = user_data.build_portfolio(data["user_details"], data["accounts"])
+
+        # Messages
+        config = {"recursion_limit": 500}
+
+        processed_messages = parse_messages_for_langgraph(data["chatMessages"])
+
+        def generate():
+            with user_data.use_portfolio(portfolio):
+                yield from stream_chat_events(
+                    graph_with_tools, {"messages": processed_messages}, config
+                )
+
+        return Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.route("/sessions", methods=["POST"])
+    def create_session():
+        """Start a session; its accounts are sent and validated only once."""
+
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Invalid or missing JSON"}), 400
+
+        session = new_session(
+            data["user_details"], data["accounts"], data.get("chatMessages")
+        )
+        session_store.save(session)
+
+        return (
+            jsonify({"session_id": session.session_id, "version": session.version}),
+            201,
+        )
+
+    @app.route("/sessions/<session_id>", methods=["DELETE"])
+    def delete_session(session_id):
+        session_store.delete(session_id)
+        return "", 204
+
+    @app.route("/sessions/<session_id>/accounts", methods=["PATCH"])
+    def patch_session_accounts(session_id):
+        """
+        Update the accounts of a session. The body holds `upsert`, a list of
+        accounts to add or replace by id, `remove`, a list of account ids, and
+        optionally new `user_details`.
+        """
+
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Invalid or missing JSON"}), 400
+
+        upsert = data.get("upsert") or []
+        remove = data.get("remove") or []
+        if not isinstance(upsert, list) or not all(
+            isinstance(account, dict) and "id" in account for account in upsert
+        ):
+            return jsonify({"error": "Every upserted account needs an id"}), 400
+        if not isinstance(remove, list):
+            return jsonify({"error": "remove must be a list of account ids"}), 400
+
+        # Re-applied to the latest version if the session changes meanwhile
+        try:
+            session = update_session(
+                session_store,
+                session_id,
+                lambda session: session.apply_account_patch(
+                    upsert, remove, data.get("user_details")
+                ),
+            )
+        except SessionConflict:
+            return jsonify({"error": "Session is being modified, try again"}), 409
+        if session is None:
+            return jsonify({"error": "Unknown session"}), 404
+
+        return jsonify({"session_id": session.session_id, "version": session.version})
+
+    @app.route("/sessions/<session_id>/chat", methods=["POST"])
+    def session_chat(session_id):
+        """Chat with the finance bot; the body only holds the new `message`."""
+
+        data = request.get_json(silent=True)
+        if not data or "message" not in data:
+            return jsonify({"error": "Invalid or missing JSON"}), 400
+
+        session = session_store.get(session_id)
+        if session is None:
+            return jsonify({"error": "Unknown session"}), 404
+
+        config = {"recursion_limit": 500}
+
+        processed_messages = parse_messages_for_langgraph(
+            session.chat_messages + [{"sender": "user", "text": data["message"]}]
+        )
+
+        with user_data.use_portfolio(session.portfolio):
+            state = graph_with_tools.invoke(
+                {"messages": processed_messages}, config=config
+            )
+
+        chatbot_messages = state.get("messages", [])
+        last_message = chatbot_messages[-1] if chatbot_messages else None
+
+        if not isinstance(last_message, AIMessage):
+            return jsonify({"error": "No valid response"}), 500
+
+        # The graph runs for a while, so the turn is appended to the latest version
+        # of the session, keeping the patches and turns saved in the meantime
+        try:
+            session = update_session(
+                session_store,
+                session_id,
+                lambda session: session.with_turn(
+                    data["message"], last_message.content
+                ),
+            )
+        except SessionConflict:
+            return jsonify({"error": "Session is being modified, try again"}), 409
+        if session is None:
+            return jsonify({"error": "Unknown session"}), 404
+
+        return jsonify({"response": last_message.content})
+
     return app
 
 
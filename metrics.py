@@ -0,0 +1,34 @@
+import threading
+
+
+class StageTimings:
+    """
+    Thread-safe running totals of how long the stages of an operation take, e.g.
+    the search and structuring calls of a grounded Gemini request, per stage name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Stage -> [count, total seconds, max seconds]
+        self._stages: dict[str, list] = {}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            totals = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """
+        Returns the count and the mean and max duration, in milliseconds, of every stage.
+        """
+        with self._lock:
+            return {
+                stage: {
+                    "count": count,
+                    "mean_ms": round(total / count * 1000, 1),
+                    "max_ms": round(longest * 1000, 1),
+                }
+                for stage, (count, total, longest) in self._stages.items()
+            }
@@ -0,0 +1,220 @@
+import csv
+import datetime
+import os
+import threading
+
+import numpy as np
+
+# Columns of a daily bar; the date is stored as days since 1970-01-01
+BAR_COLUMNS = ("date", "open", "high", "low", "close", "volume")
+DATE, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(BAR_COLUMNS))
+# Bytes of one stored bar
+BAR_SIZE = np.dtype(np.float64).itemsize * len(BAR_COLUMNS)
+
+
+def _to_day(date: str | datetime.date) -> int:
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+
+class PriceStore:
+    """
+    Daily OHLC bars per ticker, kept in `root` as one `<TICKER>.bars` file of
+    float64 rows (see BAR_COLUMNS), ordered by date, and the company names of the
+    tickers in `names.csv`.
+
+    Files are memory-mapped, so reading a ticker only touches the bars a metric
+    needs, and new bars are appended to the end of the file. A mapping is
+    refreshed when its file grows, including when another process appended to it;
+    a bar still being written is left out until it is complete.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        # Ticker -> (file size, mapped bars)
+        self._bars: dict[str, tuple[int, np.ndarray]] = {}
+        # Modification time of names.csv, and ticker -> company name
+        self._names_mtime: float | None = None
+        self._names: dict[str, str] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.root, f"{ticker.upper()}.bars")
+
+    def _map(self, ticker: str) -> tuple[int, np.ndarray] | None:
+        path = self._path(ticker)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+        # Only whole bars, in case another writer is appending right now
+        count = size // BAR_SIZE
+        if count == 0:
+            return None
+        bars = np.memmap(
+            path, dtype=np.float64, mode="r", shape=(count, len(BAR_COLUMNS))
+        )
+        return size, bars
+
+    def bars(self, ticker: str) -> np.ndarray | None:
+        """
+        Returns the bars of a ticker as a read-only (days x BAR_COLUMNS) array, or
+        None when the store has no bars for it.
+        """
+        ticker = ticker.upper()
+        try:
+            size = os.path.getsize(self._path(ticker))
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._bars.get(ticker)
+            if cached is None or cached[0] != size:
+                cached = self._map(ticker)
+                if cached is None:
+                    return None
+                self._bars[ticker] = cached
+            return cached[1]
+
+    def append_bars(self, ticker: str, bars: np.ndarray):
+        """
+        Appends bars (rows of BAR_COLUMNS) to a ticker. They must be newer than the
+        bars already stored.
+        """
+        ticker = ticker.upper()
+        bars = np.asarray(bars, dtype=np.float64).reshape(-1, len(BAR_COLUMNS))
+        if len(bars) == 0:
+            return
+        bars = bars[np.argsort(bars[:, DATE], kind="stable")]
+
+        with self._lock:
+            existing = self._map(ticker)
+            if existing is not None and bars[0, DATE] <= existing[1][-1, DATE]:
+                raise ValueError(
+                    f"Bars of {ticker} must be newer than the last stored bar"
+                )
+            with open(self._path(ticker), "ab") as bars_file:
+                bars.tofile(bars_file)
+            self._bars.pop(ticker, None)
+
+    def _names_path(self) -> str:
+        return os.path.join(self.root, "names.csv")
+
+    def _load_names(self) -> dict[str, str]:
+        try:
+            mtime = os.path.getmtime(self._names_path())
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if mtime != self._names_mtime:
+                with open(self._names_path(), newline="") as names_file:
+                    self._names = {
+                        row["ticker"].upper(): row["company_name"]
+                        for row in csv.DictReader(names_file)
+                    }
+                self._names_mtime = mtime
+            return self._names
+
+    def company_name(self, ticker: str) -> str | None:
+        """
+        Returns the company name of a ticker, or None when it is not stored.
+        """
+        return self._load_names().get(ticker.upper())
+
+    def set_company_name(self, ticker: str, company_name: str):
+        """
+        Stores the company name of a ticker, replacing the previous one.
+        """
+        names = dict(self._load_names())
+        names[ticker.upper()] = company_name
+
+        # Replaced in one step, so readers never see a partial file
+        temporary_path = f"{self._names_path()}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", newline="") as names_file:
+            writer = csv.writer(names_file)
+            writer.writerow(["ticker", "company_name"])
+            writer.writerows(sorted(names.items()))
+        os.replace(temporary_path, self._names_path())
+
+    def import_csv(self, ticker: str, path: str, company_name: str | None = None):
+        """
+        Appends the bars of a daily OHLC CSV file with Date, Open, High, Low, Close
+        and Volume columns (header names are case insensitive), e.g. a market data
+        export. Bars not newer than the stored ones are skipped. The company name,
+        when given, is stored too.
+        """
+        with open(path, newline="") as ohlc_file:
+            rows = [
+                {key.strip().lower(): value for key, value in row.items()}
+                for row in csv.DictReader(ohlc_file)
+            ]
+
+        bars = np.array(
+            [
+                [_to_day(row["date"])]
+                + [float(row[column]) for column in BAR_COLUMNS[1:]]
+                for row in rows
+            ],
+            dtype=np.float64,
+        ).reshape(-1, len(BAR_COLUMNS))
+
+        existing = self.bars(ticker)
+        if existing is not None:
+            bars = bars[bars[:, DATE] > existing[-1, DATE]]
+        self.append_bars(ticker, bars)
+        if company_name:
+            self.set_company_name(ticker, company_name)
+
+    def metrics(self, ticker: str) -> dict[str, float] | None:
+        """
+        Computes the market data fields of TickerInformation from the stored bars,
+        as of the last bar. Price changes are percentages; fields that need more
+        history than is stored are 0.
+        """
+        bars = self.bars(ticker)
+        if bars is None:
+            return None
+
+        days = bars[:, DATE]
+        closes = bars[:, CLOSE]
+        last_day = days[-1]
+        current_price = float(closes[-1])
+
+        def change_since(day: float) -> float:
+            # Percentage change from the last close on or before `day`
+            index = np.searchsorted(days, day, side="right") - 1
+            if index < 0 or closes[index] == 0:
+                return 0.0
+            return float((current_price / closes[index] - 1) * 100)
+
+        def moving_average(window: int) -> float:
+            if len(closes) < window:
+                return 0.0
+            return float(closes[-window:].mean())
+
+        year_start = _to_day(np.datetime64(int(last_day), "D").astype("datetime64[Y]"))
+        last_year = bars[days > last_day - 365]
+
+        return {
+            "current_price": current_price,
+            "daily_price_change": change_since(days[-2]) if len(days) > 1 else 0.0,
+            "weekly_price_change": change_since(last_day - 7),
+            "monthly_price_change": change_since(last_day - 30),
+            "ytd_price_change": change_since(year_start - 1),
+            "MA50": moving_average(50),
+            "MA100": moving_average(100),
+            "high_52_week": float(last_year[:, HIGH].max()),
+            "low_52_week": float(last_year[:, LOW].min()),
+            "volume": int(bars[-1, VOLUME]),
+        }
+
+    def rolling_mean(self, ticker: str, window: int) -> np.ndarray | None:
+        """
+        Returns the moving average of the closes over `window` bars, for every bar
+        from the `window`-th one on.
+        """
+        bars = self.bars(ticker)
+        if bars is None or len(bars) < window:
+            return None
+        sums = np.cumsum(np.concatenate(([0.0], bars[:, CLOSE])))
+        return (sums[window:] - sums[:-window]) / window
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+
+from google.genai import types
+from langchain_google_genai._function_utils import (
+    convert_to_genai_function_declarations,
+)
+
+from gemini_client import gemini_client
+
+logger = logging.getLogger(__name__)
+
+
+def tool_declarations(tools) -> types.Tool:
+    """
+    Converts LangChain tools into the Gemini function declarations that
+    `ChatGoogleGenerativeAI.bind_tools` sends with every request.
+    """
+    declarations = convert_to_genai_function_declarations(tools)
+    return types.Tool.model_validate_json(
+        type(declarations).to_json(
+            declarations,
+            use_integers_for_enums=False,
+            including_default_value_fields=False,
+        )
+    )
+
+
+class CachedPrefix:
+    """
+    A Gemini context cache holding the system instruction and the tool declarations
+    of the chat model, so every turn only sends the conversation and the name of
+    the cache.
+
+    The cache is created on `start` or on first use, and its TTL is extended
+    `refresh_margin` seconds before it expires: by a background thread once
+    started, otherwise by the caller of `name` that finds it about to expire.
+    Async code reads `current_name`, which never waits for a refresh. When the cache
+    cannot be created, e.g. the prefix is below the model's minimum size for
+    caching, `name` returns None for `retry_after` seconds and callers send the
+    full prompt instead.
+
+    Args:
+        model: The model the cache is created for; requests must use the same one.
+        system_instruction: The system instruction to cache.
+        tools: The LangChain tools whose declarations are cached.
+        ttl: The lifetime of the cache, in seconds.
+        refresh_margin: How long before expiry the cache is refreshed, in seconds.
+        retry_after: How long to wait after a failed creation, in seconds.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        system_instruction: str,
+        tools,
+        ttl: int = 60 * 60,
+        refresh_margin: int = 5 * 60,
+        retry_after: int = 10 * 60,
+    ):
+        self.model = model
+        self.system_instruction = system_instruction
+        self.tools = tools
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._name: str | None = None
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        self._refresher: threading.Thread | None = None
+
+    def _needs_refresh(self, now: float) -> bool:
+        if self._name is None:
+            return now >= self._retry_at
+        return now >= self._expires_at - self.refresh_margin
+
+    def _create(self, client) -> str:
+        cache = client.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name="financebot-prefix",
+                system_instruction=self.system_instruction,
+                tools=[tool_declarations(self.tools)],
+                ttl=f"{self.ttl}s",
+            ),
+        )
+        logger.info("Created the prompt cache %s", cache.name)
+        return cache.name
+
+    def refresh(self):
+        """
+        Extends the TTL of the cache, or creates it when there is none or it is gone.
+        """
+        with self._lock:
+            if not self._needs_refresh(time.monotonic()):
+                return
+
+            try:
+                with gemini_client() as client:
+                    if self._name is not None:
+                        try:
+                            client.caches.update(
+                                name=self._name,
+                                config=types.UpdateCachedContentConfig(
+                                    ttl=f"{self.ttl}s"
+                                ),
+                            )
+                        except Exception:
+                            logger.info(
+                                "Could not extend the prompt cache %s, creating a new one",
+                                self._name,
+                                exc_info=True,
+                            )
+                            self._name = self._create(client)
+                    else:
+                        self._name = self._create(client)
+                self._expires_at = time.monotonic() + self.ttl
+            except Exception:
+                logger.warning(
+                    "Could not create the prompt cache, sending full prompts",
+                    exc_info=True,
+                )
+                self._name = None
+                self._retry_at = time.monotonic() + self.retry_after
+
+    def name(self) -> str | None:
+        """
+        Returns the name of the cache, refreshing it first when it is about to
+        expire, or None when there is no cache to use.
+        """
+        if self._needs_refresh(time.monotonic()):
+            self.refresh()
+        return self._name
+
+    def current_name(self) -> str | None:
+        """
+        Returns the name of the cache without blocking, or None when there is no
+        unexpired cache. Refreshing is left to the background thread, which this
+        starts when `start` was not called yet.
+        """
+        if self._refresher is None and self._claim_refresher():
+            self._refresher.start()
+        if time.monotonic() >= self._expires_at:
+            return None
+        return self._name
+
+    def start(self):
+        """
+        Creates the cache now and keeps it refreshed from a background thread.
+        Calling it again has no effect.
+        """
+        if self._claim_refresher():
+            self.refresh()
+            self._refresher.start()
+
+    def _claim_refresher(self) -> bool:
+        """
+        Creates the refresher thread unless there is one already, and returns
+        whether this call created it and so has to start it.
+        """
+        with self._start_lock:
+            if self._refresher is not None:
+                return False
+            self._refresher = threading.Thread(
+                target=self._keep_refreshed, name="prompt-cache", daemon=True
+            )
+            return True
+
+    def _keep_refreshed(self):
+        while True:
+            self.refresh()
+            with self._lock:
+                if self._name is None:
+                    wake_at = self._retry_at
+                else:
+                    wake_at = self._expires_at - self.refresh_margin
+            time.sleep(max(wake_at - time.monotonic(), 1))
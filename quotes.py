@@ -0,0 +1,233 @@
+from abc import ABC, abstractmethod
+import csv
+import logging
+import math
+import os
+import threading
+from typing import Callable
+
+from data_models import TickerInformation, TickerNews
+from price_store import PriceStore
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteProvider(ABC):
+    """
+    A source of ticker information. Subclasses implement `get_quotes`.
+    """
+
+    @abstractmethod
+    def get_quotes(self, tickers: list[str]) -> list[TickerInformation]:
+        """
+        Returns the information of the given uppercase tickers. Tickers the provider
+        knows nothing about are left out.
+        """
+
+
+class GroundedQuoteProvider(QuoteProvider):
+    """
+    Asks Gemini, grounded with Google Search, for the ticker information.
+
+    Args:
+        fetch_quotes: Fetches the full information of a list of tickers.
+        fetch_news: Fetches only the latest market news of a list of tickers.
+    """
+
+    def __init__(
+        self,
+        fetch_quotes: Callable[[list[str]], list[TickerInformation]],
+        fetch_news: Callable[[list[str]], list[TickerNews]],
+    ):
+        self.fetch_quotes = fetch_quotes
+        self.fetch_news = fetch_news
+
+    def get_quotes(self, tickers: list[str]) -> list[TickerInformation]:
+        return self.fetch_quotes(tickers)
+
+    def get_news(self, tickers: list[str]) -> dict[str, TickerNews]:
+        """
+        Returns uppercase ticker -> latest market news and company name.
+        """
+        return {news.ticker.upper(): news for news in self.fetch_news(tickers)}
+
+
+class LocalSnapshotQuoteProvider(QuoteProvider):
+    """
+    Reads the ticker information from a local CSV or Parquet snapshot, e.g. one
+    exported by a market data feed.
+
+    The snapshot has a `ticker` column and any of the other TickerInformation
+    fields as columns. Missing or NaN numeric values are reported as 0, which is
+    shown as NOT_AVAILABLE, and missing news as an empty string. Rows with values
+    that are not numbers are logged and left out, so a CompositeQuoteProvider asks
+    the grounded provider for those tickers. The file is read again whenever it
+    changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: float | None = None
+        self._rows: dict[str, dict] = {}
+
+    def _read_rows(self) -> list[dict]:
+        if self.path.endswith(".parquet"):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError(
+                    "Reading a Parquet quote snapshot requires pyarrow"
+                ) from None
+            return pq.read_table(self.path).to_pylist()
+
+        with open(self.path, newline="") as snapshot:
+            return list(csv.DictReader(snapshot))
+
+    def _load(self) -> dict[str, dict]:
+        mtime = os.path.getmtime(self.path)
+        with self._lock:
+            if mtime != self._mtime:
+                self._rows = {
+                    str(row["ticker"]).upper(): row for row in self._read_rows()
+                }
+                self._mtime = mtime
+            return self._rows
+
+    @staticmethod
+    def _to_ticker_information(ticker: str, row: dict) -> TickerInformation | None:
+        values = {}
+        for name, field in TickerInformation.model_fields.items():
+            value = row.get(name)
+            if field.annotation is str:
+                values[name] = "" if value is None else str(value)
+                continue
+            try:
+                # CSV values are strings like "123.0", Parquet ones may be NaN
+                number = float(value) if value not in (None, "") else 0.0
+            except (TypeError, ValueError):
+                logger.warning(
+                    "Skipping %s in the quote snapshot: %s is %r", ticker, name, value
+                )
+                return None
+            if not math.isfinite(number):
+                number = 0.0
+            values[name] = int(number) if field.annotation is int else number
+        values["ticker"] = ticker
+        values["company_name"] = values["company_name"] or ticker
+        return TickerInformation(**values)
+
+    def get_quotes(self, tickers: list[str]) -> list[TickerInformation]:
+        rows = self._load()
+        quotes = []
+        for ticker in tickers:
+            if ticker in rows:
+                quote = self._to_ticker_information(ticker, rows[ticker])
+                if quote is not None:
+                    quotes.append(quote)
+        return quotes
+
+
+class PriceStoreQuoteProvider(QuoteProvider):
+    """
+    Computes the market data of the ticker information from the daily bars of a
+    local PriceStore, without any network call. The company name is the one
+    stored with the bars, or the ticker when there is none, and the market news
+    is left empty; combine it with the grounded provider in a
+    CompositeQuoteProvider to fill them in.
+    """
+
+    def __init__(self, store: PriceStore):
+        self.store = store
+
+    def get_quotes(self, tickers: list[str]) -> list[TickerInformation]:
+        quotes = []
+        for ticker in tickers:
+            metrics = self.store.metrics(ticker)
+            if metrics is not None:
+                quotes.append(
+                    TickerInformation(
+                        ticker=ticker,
+                        company_name=self.store.company_name(ticker) or ticker,
+                        summary_of_latest_market_news="",
+                        **metrics,
+                    )
+                )
+        return quotes
+
+
+class CompositeQuoteProvider(QuoteProvider):
+    """
+    Takes the market data from a fast provider, usually a local snapshot, and only
+    asks the grounded provider for what the fast one lacks: the latest market news
+    and, when the fast provider only knows the ticker, the company name of the
+    tickers it knows, and the full information of the tickers it does not.
+    """
+
+    def __init__(self, fast: QuoteProvider, grounded: GroundedQuoteProvider):
+        self.fast = fast
+        self.grounded = grounded
+
+    def get_quotes(self, tickers: list[str]) -> list[TickerInformation]:
+        quotes = {
+            quote.ticker.upper(): quote for quote in self.fast.get_quotes(tickers)
+        }
+
+        unknown = [ticker for ticker in tickers if ticker not in quotes]
+        if unknown:
+            for quote in self.grounded.get_quotes(unknown):
+                quotes[quote.ticker.upper()] = quote
+
+        incomplete = [
+            ticker
+            for ticker, quote in quotes.items()
+            if ticker not in unknown
+            and (
+                not quote.summary_of_latest_market_news
+                or quote.company_name in ("", ticker)
+            )
+        ]
+        if incomplete:
+            news = self.grounded.get_news(incomplete)
+            for ticker in incomplete:
+                if ticker not in news:
+                    continue
+                quote, update = quotes[ticker], {}
+                if not quote.summary_of_latest_market_news:
+                    update["summary_of_latest_market_news"] = news[
+                        ticker
+                    ].summary_of_latest_market_news
+                if quote.company_name in ("", ticker) and news[ticker].company_name:
+                    update["company_name"] = news[ticker].company_name
+                quotes[ticker] = quote.model_copy(update=update)
+
+        return [quotes[ticker] for ticker in tickers if ticker in quotes]
+
+
+def create_quote_provider(grounded: GroundedQuoteProvider) -> QuoteProvider:
+    """
+    Creates the quote provider selected by the QUOTE_PROVIDER environment variable:
+
+        - "grounded" (default): grounded Gemini search.
+        - "local": the CSV or Parquet snapshot at QUOTE_SNAPSHOT_PATH.
+        - "prices": the daily bars of the PriceStore at PRICE_STORE_DIR.
+        - "composite": market data from the PriceStore when PRICE_STORE_DIR is
+          set, from the snapshot otherwise, and the rest from grounded search.
+    """
+    backend = os.getenv("QUOTE_PROVIDER", "grounded").lower()
+    if backend == "grounded":
+        return grounded
+
+    price_store_dir = os.getenv("PRICE_STORE_DIR")
+    if backend == "prices" or (backend == "composite" and price_store_dir):
+        fast = PriceStoreQuoteProvider(PriceStore(price_store_dir or "prices"))
+    else:
+        fast = LocalSnapshotQuoteProvider(
+            os.getenv("QUOTE_SNAPSHOT_PATH", "quotes.csv")
+        )
+
+    if backend in ("local", "prices"):
+        return fast
+    if backend == "composite":
+        return CompositeQuoteProvider(fast, grounded)
+    raise ValueError(f"Unknown quote provider: {backend}")
@@ -0,0 +1,359 @@
+from abc import ABC, abstractmethod
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from caching import TTLCache
+from data_models import UserDetails
+import user_data
+
+
+class Session:
+    """
+    A chat session: the user's details and accounts, sent once, and the chat history.
+
+    Sessions are not modified in place; patches and chat turns return a new
+    Session with a higher `version`, which the caller saves back to the store.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        user_details: dict,
+        accounts: list[dict],
+        chat_messages: list[dict] | None = None,
+        version: int = 0,
+        portfolio: user_data.PortfolioContext | None = None,
+        schema_hash: str | None = None,
+        accounts_dirty: bool = True,
+    ):
+        self.session_id = session_id
+        self.user_details = user_details
+        self.accounts = accounts
+        self.chat_messages = chat_messages or []
+        self.version = version
+        self._portfolio = portfolio
+        # Set when `accounts` were already validated, see `user_data.build_portfolio`
+        self.schema_hash = schema_hash
+        # False when this version only changed the chat history, so stores can
+        # leave the stored accounts alone
+        self.accounts_dirty = accounts_dirty
+        self._lock = threading.Lock()
+
+    @property
+    def portfolio(self) -> user_data.PortfolioContext:
+        """
+        The validated accounts of the session, built on first use.
+        """
+        with self._lock:
+            if self._portfolio is None:
+                self._portfolio = user_data.build_portfolio(
+                    self.user_details, self.accounts, self.schema_hash
+                )
+                self._portfolio.cache_key = (self.session_id, self.version)
+            return self._portfolio
+
+    def apply_account_patch(
+        self,
+        upsert: list[dict] | None = None,
+        remove: list[str] | None = None,
+        user_details: dict | None = None,
+    ) -> "Session":
+        """
+        Returns the session with the given account changes applied.
+
+        Only the upserted accounts are validated; the other accounts are reused
+        from the current portfolio.
+
+        Args:
+            upsert: Raw accounts to add, replacing the accounts with the same id.
+            remove: Ids of the accounts to remove.
+            user_details: New raw user details, if they changed.
+        """
+        upsert = upsert or []
+        replaced_ids = {account["id"] for account in upsert} | set(remove or [])
+
+        portfolio = self.portfolio.copy()
+        portfolio.remove_accounts(replaced_ids)
+        for account in upsert:
+            portfolio.add_account(account)
+        if user_details is not None:
+            portfolio.user_details = UserDetails(**user_details)
+        portfolio.build_indexes()
+        # Versions are never reused, so this names the patched accounts
+        portfolio.cache_key = (self.session_id, self.version + 1)
+
+        accounts = [
+            account for account in self.accounts if account["id"] not in replaced_ids
+        ] + upsert
+
+        return Session(
+            self.session_id,
+            user_details if user_details is not None else self.user_details,
+            accounts,
+            self.chat_messages,
+            self.version + 1,
+            portfolio,
+        )
+
+    def with_turn(self, user_text: str, bot_text: str) -> "Session":
+        """
+        Returns the session with a chat turn appended to its history.
+        """
+        return Session(
+            self.session_id,
+            self.user_details,
+            self.accounts,
+            self.chat_messages
+            + [
+                {"sender": "user", "text": user_text},
+                {"sender": "bot", "text": bot_text},
+            ],
+            self.version + 1,
+            self._portfolio,
+            self.schema_hash,
+            accounts_dirty=False,
+        )
+
+
+def new_session(
+    user_details: dict, accounts: list[dict], chat_messages: list[dict] | None = None
+) -> Session:
+    """
+    Creates a session, validating its accounts once.
+    """
+    session_id = uuid.uuid4().hex
+    portfolio = user_data.build_portfolio(user_details, accounts)
+    portfolio.cache_key = (session_id, 0)
+    return Session(
+        session_id, user_details, accounts, chat_messages, portfolio=portfolio
+    )
+
+
+class SessionConflict(Exception):
+    """
+    Raised when a session is saved over a version it was not derived from, i.e.
+    the session changed since it was read.
+    """
+
+
+class SessionStore(ABC):
+    """
+    Storage for sessions. Subclasses implement `get`, `save` and `delete`.
+
+    `save` is a compare-and-set: a session at version N only replaces the stored
+    version N - 1, and a new session (version 0) only one that does not exist, so
+    a change made from a stale read raises SessionConflict instead of silently
+    reverting the changes saved in between.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Session | None:
+        """Returns the session, or None when it is unknown."""
+
+    @abstractmethod
+    def save(self, session: Session):
+        """Stores the session, or raises SessionConflict, see above."""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Deletes the session, if it exists."""
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Keeps sessions, with their validated portfolios, in this process. Sessions
+    unused for `ttl` seconds are dropped.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 24 * 60 * 60):
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Makes the version check and the write of `save` atomic
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session | None:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            # Reading a session keeps it alive
+            self._sessions.touch(session_id)
+        return session
+
+    def save(self, session: Session):
+        with self._lock:
+            current = self._sessions.get(session.session_id)
+            current_version = None if current is None else current.version
+            if current_version != (session.version - 1 if session.version else None):
+                raise SessionConflict(session.session_id)
+            self._sessions.set(session.session_id, session)
+
+    def delete(self, session_id: str):
+        self._sessions.delete(session_id)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Keeps sessions in a local SQLite database, so they survive restarts and are
+    shared by the worker processes of a host.
+
+    The accounts are stored as validated by this service, together with the
+    schema hash they were validated under, so loading a session takes the strict
+    validation path of `user_data.build_portfolio`. Sessions loaded by this process are
+    also kept in a small cache keyed by (session id, version).
+    """
+
+    def __init__(self, path: str = "sessions.sqlite3", cache_size: int = 256):
+        self.path = path
+        self._loaded = TTLCache(maxsize=cache_size, ttl=60 * 60)
+
+        with self._connect() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    user_details TEXT NOT NULL,
+                    accounts TEXT NOT NULL,
+                    chat_messages TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            # Commits on success, rolls back on error
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, session_id: str) -> Session | None:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            session = self._loaded.get((session_id, row[0]))
+            if session is not None:
+                return session
+
+            row = connection.execute(
+                "SELECT version, user_details, accounts, chat_messages, schema_hash "
+                "FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        version, user_details, accounts, chat_messages, schema_hash = row
+        session = Session(
+            session_id,
+            json.loads(user_details),
+            json.loads(accounts),
+            json.loads(chat_messages),
+            version,
+            schema_hash=schema_hash,
+        )
+        self._loaded.set((session_id, version), session)
+        return session
+
+    def save(self, session: Session):
+        with self._connect() as connection:
+            if session.version > 0 and not session.accounts_dirty:
+                # A chat turn: the stored accounts are already up to date
+                cursor = connection.execute(
+                    "UPDATE sessions SET version = ?, chat_messages = ?, updated_at = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (
+                        session.version,
+                        json.dumps(session.chat_messages),
+                        time.time(),
+                        session.session_id,
+                        session.version - 1,
+                    ),
+                )
+            else:
+                portfolio = session.portfolio
+                values = (
+                    session.version,
+                    json.dumps(portfolio.user_details.model_dump(mode="json")),
+                    json.dumps(portfolio.dump_accounts()),
+                    json.dumps(session.chat_messages),
+                    user_data.ACCOUNT_SCHEMA_HASH,
+                    time.time(),
+                    session.session_id,
+                )
+                if session.version == 0:
+                    cursor = connection.execute(
+                        "INSERT OR IGNORE INTO sessions "
+                        "(version, user_details, accounts, chat_messages, "
+                        "schema_hash, updated_at, session_id) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        values,
+                    )
+                else:
+                    cursor = connection.execute(
+                        "UPDATE sessions SET version = ?, user_details = ?, "
+                        "accounts = ?, chat_messages = ?, schema_hash = ?, "
+                        "updated_at = ? WHERE session_id = ? AND version = ?",
+                        values + (session.version - 1,),
+                    )
+            if cursor.rowcount != 1:
+                raise SessionConflict(session.session_id)
+        self._loaded.set((session.session_id, session.version), session)
+
+    def delete(self, session_id: str):
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+
+
+def update_session(
+    store: SessionStore, session_id: str, change, attempts: int = 5
+) -> Session | None:
+    """
+    Applies `change`, a function from a session to its next version, to the
+    latest stored session and saves the result. When the session changed in the
+    meantime, it is read again and `change` applied to the new version.
+
+    Returns the saved session, or None when there is no such session.
+
+    Raises:
+        SessionConflict: The session kept changing for `attempts` tries.
+    """
+    for _ in range(attempts):
+        session = store.get(session_id)
+        if session is None:
+            return None
+        session = change(session)
+        try:
+            store.save(session)
+            return session
+        except SessionConflict:
+            continue
+    raise SessionConflict(session_id)
+
+
+def create_session_store() -> SessionStore:
+    """
+    Creates the session store selected by the SESSION_STORE environment variable,
+    "memory" (default) or "sqlite".
+    """
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.sqlite3"))
+    if backend == "memory":
+        return InMemorySessionStore(
+            maxsize=int(os.getenv("SESSION_MAX_SESSIONS", "1024")),
+            ttl=float(os.getenv("SESSION_TTL_SECONDS", str(24 * 60 * 60))),
+        )
+    raise ValueError(f"Unknown session store: {backend}")
@@ -0,0 +1,117 @@
+import json
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+
+def format_sse_event(event: str, data: dict) -> str:
+    """
+    Formats one Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _message_text(message: BaseMessage) -> str:
+    # Gemini can return the content as a list of parts
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in message.content
+    )
+
+
+def _node_update_events(node: str, update: dict):
+    """
+    Yields the `tool_start` / `tool_end` events for the output of a graph node.
+    """
+    if node == "chatbot":
+        last_message = update["messages"][-1]
+        for tool_call in getattr(last_message, "tool_calls", None) or []:
+            yield format_sse_event(
+                "tool_start",
+                {
+                    "id": tool_call["id"],
+                    "name": tool_call["name"],
+                    "args": tool_call["args"],
+                },
+            )
+    elif node == "tools":
+        for message in update["messages"]:
+            yield format_sse_event(
+                "tool_end",
+                {
+                    "id": message.tool_call_id,
+                    "name": message.name,
+                    "status": message.status,
+                },
+            )
+
+
+# Nodes whose last message can be the answer
+ANSWER_NODES = ("chatbot", "fast_path")
+
+
+def _answer(node: str, update) -> BaseMessage | None:
+    if node in ANSWER_NODES and update and update.get("messages"):
+        return update["messages"][-1]
+    return None
+
+
+def _final_event(last_message):
+    if isinstance(last_message, AIMessage):
+        return format_sse_event("final", {"response": last_message.content})
+    return format_sse_event("error", {"error": "No valid response"})
+
+
+def stream_chat_events(graph, graph_input, config):
+    """
+    Runs the graph and yields its progress as Server-Sent Events:
+
+        - `token`: {"text"} a partial answer from the chatbot node.
+        - `tool_start`: {"id", "name", "args"} a tool call requested by the chatbot.
+        - `tool_end`: {"id", "name", "status"} a tool call that has finished.
+        - `final`: {"response"} the final answer, or `error`: {"error"} if there is none.
+    """
+    last_message = None
+
+    for mode, chunk in graph.stream(
+        graph_input, config=config, stream_mode=["messages", "updates"]
+    ):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "chatbot":
+                text = _message_text(message)
+                if text:
+                    yield format_sse_event("token", {"text": text})
+            continue
+
+        for node, update in chunk.items():
+            last_message = _answer(node, update) or last_message
+            yield from _node_update_events(node, update)
+
+    yield _final_event(last_message)
+
+
+async def astream_chat_events(graph, graph_input, config):
+    """
+    Async version of `stream_chat_events`, built on `astream_events`. Yields the
+    same events.
+    """
+    last_message = None
+
+    async for event in graph.astream_events(graph_input, config=config, version="v2"):
+        kind = event["event"]
+        node = event["metadata"].get("langgraph_node")
+
+        if kind == "on_chat_model_stream" and node == "chatbot":
+            text = _message_text(event["data"]["chunk"])
+            if text:
+                yield format_sse_event("token", {"text": text})
+        elif kind == "on_chain_end" and event["name"] == node:
+            # The end of a graph node, as opposed to the runnables nested in it
+            update = event["data"]["output"]
+            last_message = _answer(node, update) or last_message
+            for sse_event in _node_update_events(node, update):
+                yield sse_event
+
+    yield _final_event(last_message)
@@ -0,0 +1,34 @@
+import pytest
+
+from fast_path import match_intent
+
+
+@pytest.mark.parametrize(
+    "message, intent",
+    [
+        ("What's my credit card debt?", ("balance", "Credit Card")),
+        ("what is my loan debt", ("balance", "Loan")),
+        ("what is my checking balance", ("balance", "Checking")),
+        ("list my loans", ("list", "Loan")),
+        ("What is my salary?", ("payroll_summary", None)),
+    ],
+)
+def test_simple_lookups_are_matched(message, intent):
+    assert match_intent(message) == intent
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        # Income also comes from other accounts, which the payroll answer leaves out
+        "what is my income",
+        "What's my annual income?",
+        # Only cards and loans carry debt
+        "what is my checking debt",
+        "show me my savings debt",
+        # Conditions and follow-ups go to the LLM
+        "what is my loan balance if I pay $500 more",
+    ],
+)
+def test_other_messages_are_left_to_the_llm(message):
+    assert match_intent(message) is None
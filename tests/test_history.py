@@ -0,0 +1,34 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from history import compact_history
+
+
+def _tool_round(call_id: str, content: str) -> list:
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "summarize_accounts", "args": {}, "id": call_id}],
+        ),
+        ToolMessage(content, tool_call_id=call_id),
+    ]
+
+
+def test_earlier_tool_rounds_of_the_current_turn_are_truncated():
+    messages = [HumanMessage("plan my finances")]
+    for call_id in ("1", "2", "3"):
+        messages += _tool_round(call_id, call_id * 4000)
+
+    compacted = compact_history(messages, token_budget=1000, tool_message_chars=100)
+
+    tool_messages = [m for m in compacted if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in tool_messages] == ["1", "2", "3"]
+    assert all(len(m.content) < 200 for m in tool_messages[:2])
+    # The results the model is about to read are kept whole
+    assert tool_messages[-1].content == "3" * 4000
+    assert messages[2].content == "1" * 4000
+
+
+def test_history_within_budget_is_unchanged():
+    messages = [HumanMessage("hi")] + _tool_round("1", "x" * 100)
+
+    assert compact_history(messages, token_budget=1000) is messages
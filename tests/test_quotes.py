@@ -0,0 +1,53 @@
+import pytest
+
+from quotes import CompositeQuoteProvider, LocalSnapshotQuoteProvider, QuoteProvider
+
+
+def _write_snapshot(tmp_path) -> str:
+    path = tmp_path / "quotes.csv"
+    path.write_text(
+        "ticker,company_name,current_price,volume\n"
+        "AAPL,Apple Inc.,190.5,123.0\n"
+        "MSFT,,410,nan\n"
+        "BAD,Bad Row,n/a,100\n"
+    )
+    return str(path)
+
+
+def test_snapshot_values_are_coerced(tmp_path):
+    provider = LocalSnapshotQuoteProvider(_write_snapshot(tmp_path))
+
+    apple, microsoft = provider.get_quotes(["AAPL", "MSFT"])
+
+    assert apple.current_price == 190.5
+    assert apple.volume == 123
+    assert microsoft.company_name == "MSFT"
+    assert microsoft.volume == 0
+
+
+def test_malformed_rows_fall_through_to_the_grounded_provider(tmp_path):
+    class Grounded:
+        def get_quotes(self, tickers):
+            self.asked = tickers
+            return []
+
+        def get_news(self, tickers):
+            return {}
+
+    grounded = Grounded()
+    provider = CompositeQuoteProvider(
+        LocalSnapshotQuoteProvider(_write_snapshot(tmp_path)), grounded
+    )
+
+    quotes = provider.get_quotes(["AAPL", "BAD"])
+
+    assert [quote.ticker for quote in quotes] == ["AAPL"]
+    assert grounded.asked == ["BAD"]
+
+
+def test_providers_must_implement_get_quotes():
+    class NoQuotes(QuoteProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        NoQuotes()
@@ -0,0 +1,158 @@
+import math
+import os
+import re
+from collections import Counter
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+# How many tools a turn binds at most, not counting the always-bound ones
+TOOL_ROUTER_MAX_TOOLS = int(os.getenv("TOOL_ROUTER_MAX_TOOLS", "8"))
+# Tools scoring below this fraction of the best match are left out
+TOOL_ROUTER_RELATIVE_CUTOFF = float(os.getenv("TOOL_ROUTER_RELATIVE_CUTOFF", "0.35"))
+# Below this score nothing matched, and every tool is bound
+TOOL_ROUTER_MIN_SCORE = float(os.getenv("TOOL_ROUTER_MIN_SCORE", "0.12"))
+
+# Words of a tool name count as much as this many words of its description
+NAME_WEIGHT = 3
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Spellings and abbreviations users and tool names disagree on
+_SYNONYMS = {
+    "cheking": "checking",
+    "cc": "credit",
+    "stock": "ticker",
+    "share": "ticker",
+    "symbol": "ticker",
+    "portfolio": "investment",
+    "brokerage": "investment",
+    "mortgage": "loan",
+    "debt": "loan",
+    "salary": "payroll",
+    "paycheck": "payroll",
+    "income": "payroll",
+    "savings": "saving",
+}
+
+
+def _terms(text: str) -> list[str]:
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        # Plurals match their singular
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(_SYNONYMS.get(word, word))
+    return terms
+
+
+class ToolRouter:
+    """
+    Picks the tools relevant to a user message by keyword similarity, so a turn
+    binds a handful of tools instead of all of them.
+
+    Every tool is indexed once, as a TF-IDF vector of the words of its name and
+    description. A message scores each tool by the weights of the words they
+    share; the best tools are selected, together with `always` (general tools
+    like the web search). When nothing matches well enough, `select` returns None
+    and the caller binds every tool.
+
+    Args:
+        tools: The tools to choose from.
+        always: Names of tools bound on every routed turn.
+        max_tools: The maximum number of tools selected by score.
+        relative_cutoff: Tools scoring below this fraction of the best one are left out.
+        min_score: The score the best tool needs for the message to be routed.
+    """
+
+    def __init__(
+        self,
+        tools,
+        always: tuple[str, ...] = (),
+        max_tools: int = TOOL_ROUTER_MAX_TOOLS,
+        relative_cutoff: float = TOOL_ROUTER_RELATIVE_CUTOFF,
+        min_score: float = TOOL_ROUTER_MIN_SCORE,
+    ):
+        self.tools = list(tools)
+        self.always = [tool for tool in self.tools if tool.name in always]
+        self.max_tools = max_tools
+        self.relative_cutoff = relative_cutoff
+        self.min_score = min_score
+
+        counts = [
+            Counter(_terms(tool.name.replace("_", " ")) * NAME_WEIGHT)
+            + Counter(_terms(tool.description))
+            for tool in self.tools
+        ]
+        document_frequency = Counter(term for count in counts for term in count)
+        idf = {
+            term: math.log(len(self.tools) / frequency)
+            for term, frequency in document_frequency.items()
+        }
+
+        # Term -> [(tool index, weight)], with the weights of a tool normalized
+        self._postings: dict[str, list[tuple[int, float]]] = {}
+        for index, count in enumerate(counts):
+            weights = {
+                term: (1 + math.log(frequency)) * idf[term]
+                for term, frequency in count.items()
+            }
+            norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+            for term, weight in weights.items():
+                if weight > 0:
+                    self._postings.setdefault(term, []).append((index, weight / norm))
+
+    def scores(self, text: str) -> list[float]:
+        """
+        Returns the score of every tool for `text`, aligned with `tools`.
+        """
+        scores = [0.0] * len(self.tools)
+        for term in set(_terms(text)):
+            for index, weight in self._postings.get(term, ()):
+                scores[index] += weight
+        return scores
+
+    def select(self, text: str) -> list | None:
+        """
+        Returns the tools to bind for a user message, in the order of `tools`, or
+        None when no tool matches well enough and every tool should be bound.
+        """
+        scores = self.scores(text)
+        best = max(scores, default=0.0)
+        if best < self.min_score:
+            return None
+
+        ranked = sorted(range(len(self.tools)), key=scores.__getitem__, reverse=True)
+        selected = {
+            index
+            for index in ranked[: self.max_tools]
+            if scores[index] >= best * self.relative_cutoff
+        }
+        selected.update(self.tools.index(tool) for tool in self.always)
+        return [self.tools[index] for index in sorted(selected)]
+
+    def select_for_messages(self, messages: list[BaseMessage]) -> list | None:
+        """
+        Returns the tools to bind for a turn of the conversation, see `select`.
+
+        Routes on the last user message, and keeps the tools the model already
+        called since that message, so it can follow up on their results.
+        """
+        for position in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[position], HumanMessage):
+                break
+        else:
+            return None
+
+        selected = self.select(str(messages[position].content))
+        if selected is None:
+            return None
+
+        called = {
+            tool_call["name"]
+            for message in messages[position + 1 :]
+            if isinstance(message, AIMessage)
+            for tool_call in message.tool_calls
+        }
+        return [
+            tool for tool in self.tools if tool in selected or tool.name in called
+        ]
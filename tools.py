@@ -2,7 +2,121 @@ from utils import *
 from data_models import *
 import user_data
 
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool, tool
+
+import asyncio
+import functools
+import inspect
+from typing import Literal
+
+
+def grounded_tool(
+    response_schema, render=None, model="gemini-2.0-flash", cache_ttl=None
+):
+    """
+    Turns a prompt builder into a tool answered by a grounded, structured Gemini call.
+
+    The decorated function takes the tool arguments and returns the prompt; its name,
+    signature and docstring define the tool. The tool gets both a sync implementation
+    and an async one that uses the async Gemini client. On the async path the prompt
+    is built in a worker thread, as it may need the user's financial summary.
+
+    Args:
+        response_schema: The schema of the structured response.
+        render: Optional function converting the structured response into the tool output.
+        model: The Gemini model to use.
+        cache_ttl: When set, the rendered answers are kept in RESPONSE_CACHE for this
+                   many seconds, keyed by the tool arguments, and the prompt is only
+                   built on a miss. Requires `render`.
+    """
+    if cache_ttl is not None and render is None:
+        raise ValueError("Only rendered answers can be cached")
+
+    def decorator(build_prompt):
+        name = build_prompt.__name__
+        signature = inspect.signature(build_prompt)
+
+        def answer(args, kwargs):
+            (structured_response, _, _) = get_structured_output_with_grounding(
+                model, build_prompt(*args, **kwargs), response_schema
+            )
+            return render(structured_response) if render else structured_response
+
+        async def aanswer(args, kwargs):
+            prompt = await asyncio.to_thread(build_prompt, *args, **kwargs)
+            (structured_response, _, _) = await aget_structured_output_with_grounding(
+                model, prompt, response_schema
+            )
+            return render(structured_response) if render else structured_response
+
+        def run(*args, **kwargs):
+            return cached_response(
+                name,
+                model,
+                signature.bind(*args, **kwargs).arguments,
+                cache_ttl,
+                lambda: answer(args, kwargs),
+            )
+
+        async def arun(*args, **kwargs):
+            return await acached_response(
+                name,
+                model,
+                signature.bind(*args, **kwargs).arguments,
+                cache_ttl,
+                lambda: aanswer(args, kwargs),
+            )
+
+        functools.update_wrapper(run, build_prompt)
+        return StructuredTool.from_function(func=run, coroutine=arun)
+
+    return decorator
+
+
+def render_tickers_info(tickers_info: list[TickerInformation]) -> str:
+    return "\n\n".join(
+        [f"{ticker_info.ticker} : {str(ticker_info)}" for ticker_info in tickers_info]
+    )
+
+
+def render_credit_cards(cards: list[BasicCreditCardDetails]) -> str:
+    return "\n".join([str(card) for card in cards])
+
+
+# How long grounded answers are reused, in seconds, see `utils.cached_response`
+SEARCH_CACHE_TTL = 6 * 60 * 60
+CARDS_CACHE_TTL = 24 * 60 * 60
+TICKERS_CACHE_TTL = 60 * 60
+
+SEARCH_MODEL = "gemini-2.0-flash"
+
+
+async def _asearch_and_answer(query: str) -> str:
+    return await acached_response(
+        "search_and_answer",
+        SEARCH_MODEL,
+        query,
+        SEARCH_CACHE_TTL,
+        lambda: _asearch(query),
+    )
+
+
+async def _asearch(query: str) -> str:
+    model_id = SEARCH_MODEL
+
+    google_search_tool = Tool(google_search=GoogleSearch())
+
+    async with async_gemini_client() as client:
+        response = await client.aio.models.generate_content(
+            model=model_id,
+            contents=query,
+            config=GenerateContentConfig(
+                tools=[google_search_tool],
+                response_modalities=["TEXT"],
+            ),
+        )
+
+    return "\n".join([x.text for x in response.candidates[0].content.parts])
 
 
 @tool
@@ -23,23 +137,36 @@ def search_and_answer(query: str) -> str:
       and return the answer accordingly.
 
     """
-    client = genai.Client()
-    model_id = "gemini-2.0-flash"
+    return cached_response(
+        "search_and_answer",
+        SEARCH_MODEL,
+        query,
+        SEARCH_CACHE_TTL,
+        lambda: _search(query),
+    )
+
+
+def _search(query: str) -> str:
+    model_id = SEARCH_MODEL
 
     google_search_tool = Tool(google_search=GoogleSearch())
 
-    response = client.models.generate_content(
-        model=model_id,
-        contents=query,
-        config=GenerateContentConfig(
-            tools=[google_search_tool],
-            response_modalities=["TEXT"],
-        ),
-    )
+    with gemini_client() as client:
+        response = client.models.generate_content(
+            model=model_id,
+            contents=query,
+            config=GenerateContentConfig(
+                tools=[google_search_tool],
+                response_modalities=["TEXT"],
+            ),
+        )
 
     return "\n".join([x.text for x in response.candidates[0].content.parts])
 
 
+search_and_answer.coroutine = _asearch_and_answer
+
+
 @tool
 def get_user_details() -> UserDetails:
     """
@@ -64,7 +191,8 @@ def get_user_details() -> UserDetails:
         - User asks: "Are there any state-specific tax benefits I should know about?"
         - Bot needs to understand the user's general context before providing tax or residency-related advice.
     """
-    return anonymize_user_personal_details(user_data.UserDetails)
+    portfolio = user_data.get_portfolio()
+    return anonymize_user_personal_details(portfolio.user_details)
 
 
 # Manage Tickers
@@ -110,17 +238,14 @@ def get_tickers_info(tickers: list[str]) -> str:
     Usage Examples:
         - User asks: "What is the current price and news for Google?" -> Call with `tickers=['GOOG']`.
         - User asks: "Show me the performance details for TSLA and F." -> Call with `tickers=['TSLA', 'F']`.
-        - Bot needs to provide current market context after identifying user's holdings (e.g., after calling `extract_unique_tickers_investment_accounts`).
+        - Bot needs to provide current market context after identifying user's holdings (e.g., after calling `extract_account_tickers`).
     """
-    return "\n\n".join(
-        [
-            f"{ticker_info.ticker} : {str(ticker_info)}"
-            for ticker_info in retrieve_tickers_info(tickers)
-        ]
-    )
+    return render_tickers_info(retrieve_tickers_info(tickers))
 
 
-@tool
+@grounded_tool(
+    list[TickerInformation], render=render_tickers_info, cache_ttl=TICKERS_CACHE_TTL
+)
 def identify_better_tickers(prev_tickers: list[str], criteria: str) -> str:
     """
     Identifies and retrieves data for potentially better investment tickers based on criteria.
@@ -197,13 +322,7 @@ Instructions:
     * `Summary of latest market news` (1-2 relevant paragraphs - Map to 'summary_of_latest_market_news')
 """
 
-    (tickers, _, _) = get_structured_output_with_grounding(
-        "gemini-2.0-flash", prompt, list[TickerInformation]
-    )
-
-    return "\n\n".join(
-        [f"{ticker_info.ticker} : {str(ticker_info)}" for ticker_info in tickers]
-    )
+    return prompt
 
 
 # Investment Accounts
@@ -235,10 +354,11 @@ def extract_unique_tickers_investment_accounts(
         - User asks: "What stocks do I own in my 'Tech Portfolio' account (ID: inv-123)?"
         - Bot needs to know which specific tickers to look up market data for, based on holdings in certain accounts (e.g., "Get quotes for stocks in accounts inv-123 and inv-456").
     """
+    portfolio = user_data.get_portfolio()
     tickers = set()
 
     for id_ in investment_account_ids:
-        record = user_data.INVESTMENT_ACCOUNTS_DICT.get(id_)
+        record = portfolio.investment_accounts_dict.get(id_)
         assets = record.asset_distribution
 
         tickers = tickers | {asset.ticker.upper() for asset in assets}
@@ -330,8 +450,9 @@ def get_investment_account(
         - "How much cash is available in my 'Growth Portfolio' investment account?"
         - User selects a specific account from a list provided by `get_all_investment_account_ids_and_names`.
     """
+    portfolio = user_data.get_portfolio()
 
-    account = user_data.INVESTMENT_ACCOUNTS_DICT.get(account_id, None)
+    account = portfolio.investment_accounts_dict.get(account_id, None)
 
     if not account:
         # Return a more specific exception or error message structure if preferred
@@ -369,9 +490,10 @@ def get_all_investment_account_ids_and_names() -> list[dict[str, str]]:
         - "I want to check the balance of one of my investment accounts, what are they called?"
         - User asks a question about an investment account without specifying which one, and the agent needs to clarify.
     """
+    portfolio = user_data.get_portfolio()
     return [
         {"id": account.id, "name": account.name}
-        for account in user_data.INVESTMENT_ACCOUNTS
+        for account in portfolio.investment_accounts
     ]
 
 
@@ -400,10 +522,11 @@ def extract_unique_tickers_traditional_ira(
         - (Often used internally before calling get_investment_tickers_info for IRA holdings)
         - User query: "What tickers are in my Traditional IRA accounts 'TIRA-1' and 'TIRA-2'?"
     """
+    portfolio = user_data.get_portfolio()
     tickers = set()
 
     for id_ in traditional_ira_account_ids:
-        record = user_data.TRADITIONAL_IRAS_DICT.get(id_)
+        record = portfolio.traditional_iras_dict.get(id_)
         assets = record.asset_distribution
 
         tickers = tickers | {asset.ticker.upper() for asset in assets}
@@ -494,8 +617,9 @@ def get_traditional_ira_account(
         - "What's the contribution amount and holdings for my 'Vanguard Trad IRA'?"
         - User selects a specific Traditional IRA from a list.
     """
+    portfolio = user_data.get_portfolio()
 
-    account = user_data.TRADITIONAL_IRAS_DICT.get(traditional_ira_account_id, None)
+    account = portfolio.traditional_iras_dict.get(traditional_ira_account_id, None)
 
     if not account:
         return Exception(
@@ -532,7 +656,8 @@ def get_all_traditional_ira_account_ids_and_names() -> list[dict[str, str]]:
         - "What are the names of my Traditional IRAs?"
         - User asks about a Traditional IRA without specifying which one.
     """
-    return [{"id": ira.id, "name": ira.name} for ira in user_data.TRADITIONAL_IRAS]
+    portfolio = user_data.get_portfolio()
+    return [{"id": ira.id, "name": ira.name} for ira in portfolio.traditional_iras]
 
 
 # Roth IRAs
@@ -560,10 +685,11 @@ def extract_unique_tickers_roth_ira(
         - (Often used internally before calling get_investment_tickers_info for Roth IRA holdings)
         - User query: "What tickers are in my Roth IRA account 'RIRA-Main'?"
     """
+    portfolio = user_data.get_portfolio()
     tickers = set()
 
     for id_ in roth_ira_account_ids:
-        record = user_data.ROTH_IRAS_DICT.get(id_)
+        record = portfolio.roth_iras_dict.get(id_)
         assets = record.asset_distribution
 
         tickers = tickers | {asset.ticker.upper() for asset in assets}
@@ -654,8 +780,9 @@ def get_roth_ira_account(
         - "Show the contribution and balance for my 'Fidelity Roth IRA'."
         - User selects a specific Roth IRA from a list.
     """
+    portfolio = user_data.get_portfolio()
 
-    account = user_data.ROTH_IRAS_DICT.get(roth_ira_account_id, None)
+    account = portfolio.roth_iras_dict.get(roth_ira_account_id, None)
 
     if not account:
         return Exception(f"Roth IRA account with ID '{roth_ira_account_id}' not found.")
@@ -690,8 +817,9 @@ def get_all_roth_ira_account_ids_and_names() -> list[dict[str, str]]:
         - "What Roth IRAs do I have?"
         - User asks about a Roth IRA without specifying which one.
     """
+    portfolio = user_data.get_portfolio()
     return [
-        {"id": roth_ira.id, "name": roth_ira.name} for roth_ira in user_data.ROTH_IRAS
+        {"id": roth_ira.id, "name": roth_ira.name} for roth_ira in portfolio.roth_iras
     ]
 
 
@@ -720,10 +848,11 @@ def extract_unique_tickers_401k(
         - (Often used internally before calling get_investment_tickers_info for 401(k) holdings)
         - User query: "What funds are in my main 401(k) account 'EMP401K-TRAD'?"
     """
+    portfolio = user_data.get_portfolio()
     tickers = set()
 
     for id_ in retirment_401k_account_ids:
-        record = user_data.RETIREMENT_401KS_DICT.get(id_)
+        record = portfolio.retirement_401ks_dict.get(id_)
         assets = record.asset_distribution
 
         tickers = tickers | {asset.ticker.upper() for asset in assets}
@@ -818,8 +947,9 @@ def get_401k_account(
         - "List the funds and their performance in my main 401(k)."
         - User selects a specific 401(k) from a list.
     """
+    portfolio = user_data.get_portfolio()
 
-    account = user_data.RETIREMENT_401KS_DICT.get(retirement_401k_account_id, None)
+    account = portfolio.retirement_401ks_dict.get(retirement_401k_account_id, None)
 
     if not account:
         return Exception(
@@ -857,9 +987,10 @@ def get_all_401k_account_ids_and_names() -> list[dict[str, str]]:
         - "What are the names of my Traditional 401(k)s?"
         - User asks about a 401(k) without specifying which one.
     """
+    portfolio = user_data.get_portfolio()
     return [
         {"id": ret_401k.id, "name": ret_401k.name}
-        for ret_401k in user_data.RETIREMENT_401KS
+        for ret_401k in portfolio.retirement_401ks
     ]
 
 
@@ -886,10 +1017,11 @@ def extract_unique_tickers_roth_401k(
         - (Often used internally before calling get_investment_tickers_info for Roth 401(k) holdings)
         - User query: "What funds are in my Roth 401(k) 'MyCompany-Roth'?"
     """
+    portfolio = user_data.get_portfolio()
     tickers = set()
 
     for id_ in roth_401k_account_ids:
-        record = user_data.ROTH_401KS_DICT.get(id_)
+        record = portfolio.roth_401ks_dict.get(id_)
         assets = record.asset_distribution
 
         tickers = tickers | {asset.ticker.upper() for asset in assets}
@@ -984,8 +1116,9 @@ def get_roth_401k_account(
         - "What funds are in my 'Company Roth 401k'?"
         - User selects a specific Roth 401(k) from a list.
     """
+    portfolio = user_data.get_portfolio()
 
-    account = user_data.ROTH_401KS_DICT.get(roth_401k_account_id, None)
+    account = portfolio.roth_401ks_dict.get(roth_401k_account_id, None)
 
     if not account:
         return Exception(
@@ -1023,9 +1156,10 @@ def get_all_roth_401k_account_ids_and_names() -> list[dict[str, str]]:
         - "Do I have a Roth 401(k)?"
         - User asks about a Roth 401(k) without specifying which one.
     """
+    portfolio = user_data.get_portfolio()
     return [
         {"id": roth_401k.id, "name": roth_401k.name}
-        for roth_401k in user_data.ROTH_401KS
+        for roth_401k in portfolio.roth_401ks
     ]
 
 
@@ -1033,7 +1167,7 @@ def get_all_roth_401k_account_ids_and_names() -> list[dict[str, str]]:
 
 
 @tool
-def summary_of_credit_cards() -> SummaryOfCreditCards:
+def summary_of_credit_cards() -> str:
     """
     Provides a consolidated summary of all the user's credit card accounts.
 
@@ -1061,7 +1195,7 @@ def summary_of_credit_cards() -> SummaryOfCreditCards:
         - "Show my credit card spending by category for this month."
         - "What's the average interest rate I'm paying on my credit card debt?"
     """
-    return get_summary_of_credit_cards()
+    return get_summary_of_credit_cards.rendered()
 
 
 @tool
@@ -1085,7 +1219,8 @@ def get_all_credit_cards():
         - "What credit cards do I have with you?"
         - User asks about a specific card's balance or limit without specifying which card.
     """
-    return [{"id": card.id, "name": card.name} for card in user_data.CREDIT_CARDS]
+    portfolio = user_data.get_portfolio()
+    return [{"id": card.id, "name": card.name} for card in portfolio.credit_cards]
 
 
 @tool
@@ -1119,8 +1254,9 @@ def get_credit_card(card_id: str) -> CreditCard | Exception:
         - "List the recent transactions for my Amex Gold card."
         - User selects a specific card from the list provided by `get_all_credit_cards`.
     """
+    portfolio = user_data.get_portfolio()
 
-    card = user_data.CREDIT_CARDS_DICT.get(card_id, None)
+    card = portfolio.credit_cards_dict.get(card_id, None)
 
     if not card:
         return Exception(f"Credit Card with ID: {card_id} not found")
@@ -1128,10 +1264,8 @@ def get_credit_card(card_id: str) -> CreditCard | Exception:
     return card
 
 
-@tool
-def optimize_spending_in_a_category(
-    open_to_new_cards: bool, category: str
-) -> OptimalCreditCardSpending:
+@grounded_tool(OptimalCreditCardSpending)
+def optimize_spending_in_a_category(open_to_new_cards: bool, category: str) -> str:
     """
     Analyzes user's spending in a specific category and suggests optimal credit card usage, potentially including new card recommendations, using grounded web search.
 
@@ -1158,6 +1292,7 @@ def optimize_spending_in_a_category(
         - "Suggest the best card for gas, I don't want a new one right now."
         - "Optimize my dining expenses."
     """
+    portfolio = user_data.get_portfolio()
 
     user_intent_on_new_cards = (
         "The user is open to applying for new credit cards if they offer significant benefits for this category."
@@ -1178,7 +1313,7 @@ def optimize_spending_in_a_category(
             annual_fee=cc.annual_fee,
             rewards_summary=cc.rewards_summary,
         )
-        for cc in user_data.CREDIT_CARDS
+        for cc in portfolio.credit_cards
     ]
 
     prompt = f"""
@@ -1209,17 +1344,13 @@ def optimize_spending_in_a_category(
 
 """
 
-    (structured_response, _, _) = get_structured_output_with_grounding(
-        "gemini-2.0-flash", prompt, OptimalCreditCardSpending
-    )
-
-    return structured_response
+    return prompt
 
 
-@tool
+@grounded_tool(OptimalCreditCardSpending)
 def optimize_spending_with_cc_all_categories(
     open_to_new_cards: bool,
-) -> OptimalCreditCardSpending:
+) -> str:
     """
     Analyzes user's overall credit card spending across all categories and suggests an optimal usage strategy, potentially including new card recommendations, using grounded web search.
 
@@ -1245,6 +1376,7 @@ def optimize_spending_with_cc_all_categories(
         - "Help me create a strategy to use my existing cards more effectively across different categories."
         - "Recommend a credit card setup for maximizing cash back based on my spending."
     """
+    portfolio = user_data.get_portfolio()
     user_intent_on_new_cards = (
         "User is open to new cards"
         if open_to_new_cards
@@ -1264,7 +1396,7 @@ def optimize_spending_with_cc_all_categories(
             annual_fee=cc.annual_fee,
             rewards_summary=cc.rewards_summary,
         )
-        for cc in user_data.CREDIT_CARDS
+        for cc in portfolio.credit_cards
     ]
 
     current_cc_details_str = "\n".join(f"- {str(cc)} " for cc in current_cc)
@@ -1297,14 +1429,12 @@ Instructions:
 
 """
 
-    (structured_response, _, _) = get_structured_output_with_grounding(
-        "gemini-2.0-flash", prompt, OptimalCreditCardSpending
-    )
-
-    return structured_response
+    return prompt
 
 
-@tool
+@grounded_tool(
+    list[BasicCreditCardDetails], render=render_credit_cards, cache_ttl=CARDS_CACHE_TTL
+)
 def get_better_cards_for_category(category: str, criteria: str) -> str:
     """
     Retrieves a list of credit cards available in the market that are well-suited for a specific spending category based on given criteria, using grounded web search.
@@ -1350,18 +1480,14 @@ Instructions:
    - Rewards Summary (Provide a concise summary focusing on how its rewards/benefits apply to the '{category}' and meet the '{criteria}'. Mention specific rates or point multipliers for the category if possible.)
 """
 
-    (structured_response, _, _) = get_structured_output_with_grounding(
-        "gemini-2.0-flash", prompt, list[BasicCreditCardDetails]
-    )
-
-    return "\n".join([str(card) for card in structured_response])
+    return prompt
 
 
 # Checking Accounts
 
 
 @tool
-def summary_of_cheking_accounts() -> SummaryOfCheckingOrSavingsAccounts:
+def summary_of_cheking_accounts() -> str:
     """
     Provides a consolidated summary of all the user's checking accounts.
 
@@ -1391,7 +1517,7 @@ def summary_of_cheking_accounts() -> SummaryOfCheckingOrSavingsAccounts:
         - "What's the net cash flow in my checking accounts recently?"
     """
 
-    return get_summary_of_checking_or_savings_accounts(is_checking=True)
+    return get_summary_of_checking_or_savings_accounts.rendered(is_checking=True)
 
 
 @tool
@@ -1415,9 +1541,10 @@ def get_all_checking_accounts() -> list[dict[str, str]]:
         - "What are the names of my checking accounts?"
         - User asks about a transaction or balance without specifying which checking account.
     """
+    portfolio = user_data.get_portfolio()
     return [
         {"id": account.id, "name": account.name}
-        for account in user_data.CHECKING_ACCOUNTS
+        for account in portfolio.checking_accounts
     ]
 
 
@@ -1455,7 +1582,8 @@ def get_checking_account(account_id: str) -> CheckingOrSavingsAccount | Exceptio
         - "What are the fees associated with checking account CHK1?"
         - User selects a specific checking account from the list.
     """
-    account = user_data.CHECKING_ACCOUNTS_DICT.get(account_id, None)
+    portfolio = user_data.get_portfolio()
+    account = portfolio.checking_accounts_dict.get(account_id, None)
 
     if not account:
         return Exception(f"Checking Account with ID: {account_id} not found")
@@ -1467,7 +1595,7 @@ def get_checking_account(account_id: str) -> CheckingOrSavingsAccount | Exceptio
 
 
 @tool
-def summary_of_saving_accounts() -> SummaryOfCheckingOrSavingsAccounts:
+def summary_of_saving_accounts() -> str:
     """
     Provides a consolidated summary of all the user's savings accounts.
 
@@ -1496,7 +1624,7 @@ def summary_of_saving_accounts() -> SummaryOfCheckingOrSavingsAccounts:
         - "What interest rates are my savings accounts earning?"
         - "Show the net change in my savings balance recently."
     """
-    return get_summary_of_checking_or_savings_accounts(is_checking=False)
+    return get_summary_of_checking_or_savings_accounts.rendered(is_checking=False)
 
 
 @tool
@@ -1520,9 +1648,10 @@ def get_all_saving_accounts() -> list[dict[str, str]]:
         - "What are the names of my savings accounts?"
         - User asks about interest rate or balance without specifying which savings account.
     """
+    portfolio = user_data.get_portfolio()
     return [
         {"id": account.id, "name": account.name}
-        for account in user_data.SAVING_ACCOUNTS
+        for account in portfolio.saving_accounts
     ]
 
 
@@ -1555,7 +1684,8 @@ def get_saving_account(account_id: str) -> CheckingOrSavingsAccount | Exception:
         - "List recent interest payments to my emergency fund account."
         - User selects a specific savings account from the list.
     """
-    account = user_data.SAVING_ACCOUNTS_DICT.get(account_id, None)
+    portfolio = user_data.get_portfolio()
+    account = portfolio.saving_accounts_dict.get(account_id, None)
 
     if not account:
         return Exception(f"Savings Account with ID: {account_id} not found")
@@ -1568,7 +1698,7 @@ def get_saving_account(account_id: str) -> CheckingOrSavingsAccount | Exception:
 
 # Need to include Payment History?
 @tool
-def summary_of_loan_accounts() -> SummaryOfLoanAccounts:
+def summary_of_loan_accounts() -> str:
     """
     Provides a consolidated summary of all the user's loan accounts (e.g., mortgage, auto, student, personal loans).
 
@@ -1606,7 +1736,7 @@ def summary_of_loan_accounts() -> SummaryOfLoanAccounts:
         - "What types of loans do I have?"
         - "Are any of my loans incurring late fees?"
     """
-    return get_summary_of_loan_accounts()
+    return get_summary_of_loan_accounts.rendered()
 
 
 @tool
@@ -1630,8 +1760,9 @@ def get_all_loans() -> list[dict[str, str]]:
         - "What loans am I currently paying off?"
         - User asks about interest rate or balance without specifying which loan.
     """
+    portfolio = user_data.get_portfolio()
 
-    return [{"id": loan.id, "name": loan.name} for loan in user_data.LOANS]
+    return [{"id": loan.id, "name": loan.name} for loan in portfolio.loans]
 
 
 @tool
@@ -1675,8 +1806,9 @@ def get_loan(loan_id: str) -> Loan | Exception:
         - "List the payment history for loan LN1."
         - User selects a specific loan from the list.
     """
+    portfolio = user_data.get_portfolio()
 
-    loan = user_data.LOANS_DICT.get(loan_id, None)
+    loan = portfolio.loans_dict.get(loan_id, None)
 
     if not loan:
         return Exception(f"Loan with ID: {loan_id} not found")
@@ -1688,7 +1820,7 @@ def get_loan(loan_id: str) -> Loan | Exception:
 
 
 @tool
-def summary_of_payroll_accounts() -> SummaryOfPayrollAccounts:
+def summary_of_payroll_accounts() -> str:
     """
     Provides a consolidated summary of all the user's payroll information entries.
 
@@ -1721,7 +1853,7 @@ def summary_of_payroll_accounts() -> SummaryOfPayrollAccounts:
         - "Show my total tax withholdings."
         - "What benefits are listed in my payroll data?"
     """
-    return get_summary_of_payroll_accounts()
+    return get_summary_of_payroll_accounts.rendered()
 
 
 @tool
@@ -1745,7 +1877,8 @@ def get_all_payrolls() -> list[dict[str, str]]:
         - "Which payroll records do you have for me?"
         - User asks about deductions or income without specifying which job/payroll.
     """
-    return [{"id": payroll.id, "name": payroll.name} for payroll in user_data.PAYROLLS]
+    portfolio = user_data.get_portfolio()
+    return [{"id": payroll.id, "name": payroll.name} for payroll in portfolio.payrolls]
 
 
 @tool
@@ -1784,7 +1917,8 @@ def get_payroll(payroll_id: str) -> Payroll | Exception:
         - "What is the pay frequency for my main job?"
         - User selects a specific payroll record from the list.
     """
-    payroll = user_data.PAYROLLS_DICT.get(payroll_id, None)
+    portfolio = user_data.get_portfolio()
+    payroll = portfolio.payrolls_dict.get(payroll_id, None)
 
     if not payroll:
         return Exception(f"Payroll with ID: {payroll_id} not found")
@@ -1843,8 +1977,9 @@ def get_all_hsa_accounts() -> list[dict[str, str]]:
         - "What HSAs do I have?"
         - User asks about contributions or investments without specifying which HSA.
     """
+    portfolio = user_data.get_portfolio()
     return [
-        {"id": account.id, "name": account.name} for account in user_data.HSA_ACCOUNTS
+        {"id": account.id, "name": account.name} for account in portfolio.hsa_accounts
     ]
 
 
@@ -1889,7 +2024,8 @@ def get_hsa_account(account_id: str) -> SummaryOfHSAAccounts | Exception:
         - "How much cash do I have in HSA account HSA1?"
         - User selects a specific HSA from the list.
     """
-    account = user_data.HSA_ACCOUNTS_DICT.get(account_id, None)
+    portfolio = user_data.get_portfolio()
+    account = portfolio.hsa_accounts_dict.get(account_id, None)
 
     if not account:
         return Exception(f"HSA Account with ID: {account_id} not found")
@@ -1907,7 +2043,7 @@ def get_hsa_account(account_id: str) -> SummaryOfHSAAccounts | Exception:
 
 
 @tool
-def summary_of_other_accounts() -> SummaryOfOtherAccounts:
+def summary_of_other_accounts() -> str:
     """
     Provides a consolidated summary of all accounts categorized as 'Other'.
 
@@ -1928,7 +2064,7 @@ def summary_of_other_accounts() -> SummaryOfOtherAccounts:
         - "Is there any debt recorded in my 'other' accounts category?"
     """
 
-    return get_summary_of_other_accounts()
+    return get_summary_of_other_accounts.rendered()
 
 
 @tool
@@ -1951,8 +2087,9 @@ def get_all_other_accounts() -> list[dict[str, str]]:
         - "List my 'other' accounts."
         - "What accounts are in the 'other' category?"
     """
+    portfolio = user_data.get_portfolio()
     return [
-        {"id": account.id, "name": account.name} for account in user_data.OTHER_ACCOUNTS
+        {"id": account.id, "name": account.name} for account in portfolio.other_accounts
     ]
 
 
@@ -1979,7 +2116,8 @@ def get_other_account(account_id: str) -> OtherAccount | Exception:
         - "What's the balance reported for my PayPal account?"
         - User selects a specific account from the 'other' list.
     """
-    account = user_data.OTHER_ACCOUNTS_DICT.get(account_id, None)
+    portfolio = user_data.get_portfolio()
+    account = portfolio.other_accounts_dict.get(account_id, None)
 
     if not account:
         return Exception(f"Other Account with ID: {account_id} not found")
@@ -1990,8 +2128,8 @@ def get_other_account(account_id: str) -> OtherAccount | Exception:
 # Overall Financial Plan
 
 
-@tool
-def optimize_financial_plan(criteria: str) -> FinancialPlan:
+@grounded_tool(FinancialPlan)
+def optimize_financial_plan(criteria: str) -> str:
     """
     Generates a personalized financial plan aimed at optimizing the user's finances based on a specific goal or criteria, using grounded web search and the user's overall financial summary.
 
@@ -2014,11 +2152,12 @@ def optimize_financial_plan(criteria: str) -> FinancialPlan:
         - "Give me a strategy to balance debt repayment and investing."
         - "Develop a plan to improve my overall financial health."
     """
+    portfolio = user_data.get_portfolio()
 
     prompt = f"""
 Context:
 - User Details:
-{anonymize_user_personal_details(user_data.USER_DETAILS)}
+{anonymize_user_personal_details(portfolio.user_details)}
 - User's Comprehensive Financial Summary:
 {get_user_financial_summary()}
 - User's Stated Financial Goal/Optimization Criteria: {criteria}
@@ -2036,17 +2175,13 @@ Instructions:
 4. Develop Actionable Steps (instructions): Create specific, actionable steps the user can take, derived primarily from their financial summary. Format these steps into a single, well-structured string intended for the instructions field. Use clear Markdown formatting within this string (such as headings like ## Financial Area or ## Phase 1, and numbered 1. or bulleted - lists) to organize the steps logically for readability. Ensure the entire plan's steps are contained within this single string. Use grounded search ONLY if external general financial information (e.g., current retirement contribution limits for the year 2025, standard financial benchmarks) is necessary to make the plan realistic or informative. Do NOT give specific investment advice (e.g., "buy stock X").
 """
 
-    (structured_response, _, _) = get_structured_output_with_grounding(
-        "gemini-2.0-flash", prompt, FinancialPlan
-    )
-
-    return structured_response
+    return prompt
 
 
-@tool
+@grounded_tool(FinancialPlan)
 def how_can_I_make_X_money_in_Y_months(
     amount: float, months: int, criteria: str
-) -> FinancialPlan:
+) -> str:
     """
     Generates a financial plan focused on achieving a specific monetary gain target within a defined timeframe, using grounded web search and the user's financial summary.
 
@@ -2093,17 +2228,11 @@ def how_can_I_make_X_money_in_Y_months(
         "4. Develop Actionable Steps (`instructions` string): Create specific, actionable steps based primarily on the user's financial summary. Combine all these steps into a single string value for the `instructions` field. Ensure the entire output for the plan's steps is one continuous string. Use grounded search ONLY if external general financial information (e.g., current {datetime.date.today().year} retirement contribution limits, standard financial benchmarks) is necessary for context or realism. Do NOT give specific investment advice.\n"  # Updated instruction #4
     )
 
-    (structured_response, _, _) = get_structured_output_with_grounding(
-        "gemini-2.0-flash", prompt, FinancialPlan
-    )
-
-    return structured_response
+    return prompt
 
 
-@tool
-def how_can_save_X_money_in_Y_months(
-    amount: float, months: int, criteria: str
-) -> FinancialPlan:
+@grounded_tool(FinancialPlan)
+def how_can_save_X_money_in_Y_months(amount: float, months: int, criteria: str) -> str:
     """
     Generates a financial plan focused on achieving a specific savings target within a defined timeframe, using grounded web search and the user's financial summary.
 
@@ -2161,8 +2290,141 @@ If unrealistic: clearly state why and suggest either a revised savings goal or a
 Be practical, grounded, and solution-focused.
 """
 
-    (structured_response, _, _) = get_structured_output_with_grounding(
-        "gemini-2.0-flash", prompt, FinancialPlan
+    return prompt
+
+
+# Account tools for every account type
+
+# The per-type tools above, by account type (see `user_data.ACCOUNT_TYPES`)
+_ACCOUNT_SUMMARY_TOOLS = {
+    "Investment": summary_of_investment_accounts,
+    "Credit Card": summary_of_credit_cards,
+    "Checking": summary_of_cheking_accounts,
+    "Savings": summary_of_saving_accounts,
+    "Loan": summary_of_loan_accounts,
+    "Payroll": summary_of_payroll_accounts,
+    "Traditional IRA": summary_of_traditional_ira_accounts,
+    "Roth IRA": summary_of_roth_ira_accounts,
+    "Retirement 401k": summary_of_401k_accounts,
+    "Roth 401k": summary_of_roth_401k_accounts,
+    "HSA": summary_of_hsa_accounts,
+    "Other": summary_of_other_accounts,
+}
+_ACCOUNT_DETAIL_TOOLS = {
+    "Investment": get_investment_account,
+    "Credit Card": get_credit_card,
+    "Checking": get_checking_account,
+    "Savings": get_saving_account,
+    "Loan": get_loan,
+    "Payroll": get_payroll,
+    "Traditional IRA": get_traditional_ira_account,
+    "Roth IRA": get_roth_ira_account,
+    "Retirement 401k": get_401k_account,
+    "Roth 401k": get_roth_401k_account,
+    "HSA": get_hsa_account,
+    "Other": get_other_account,
+}
+assert (
+    _ACCOUNT_SUMMARY_TOOLS.keys()
+    == _ACCOUNT_DETAIL_TOOLS.keys()
+    == user_data.ACCOUNT_TYPES.keys()
+)
+
+AccountTypeName = Literal[tuple(user_data.ACCOUNT_TYPES)]
+
+
+@tool
+def list_accounts(account_type: AccountTypeName) -> list[dict[str, str]]:
+    """
+    Lists the user's accounts of one type, with their IDs and names.
+
+    Use it to find the ID of an account the user refers to by name, before calling
+    `get_account` or `extract_account_tickers`.
+
+    Args:
+        account_type: The type of accounts to list.
+
+    Returns:
+        list[dict[str, str]]: One {"id", "name"} dictionary per account.
+    """
+    portfolio = user_data.get_portfolio()
+    family = user_data.ACCOUNT_TYPES[account_type].family
+    return [
+        {"id": account.id, "name": account.name}
+        for account in getattr(portfolio, family)
+    ]
+
+
+@tool
+def summarize_accounts(account_type: AccountTypeName):
+    """
+    Summarizes all the user's accounts of one type.
+
+    - Investment, IRAs, 401ks and HSA: uninvested cash (and contributions for
+      retirement accounts and HSAs) and, per ticker held, the quantity, average cost
+      basis, current market data, latest news and unrealized gain or loss.
+    - Credit Card: total limit, available credit, debt, APRs, annual fees, rewards
+      and spending per category in the current billing cycle.
+    - Checking, Savings: total balance, net flow and spending per category in the
+      current cycle, interest rates and fees.
+    - Loan: balances, amounts paid, principal remaining, interest rates and
+      upcoming due dates.
+    - Payroll: annual, net and bonus income, withholdings and pay frequencies.
+    - Other: total income and debt.
+
+    Args:
+        account_type: The type of accounts to summarize.
+    """
+    return _ACCOUNT_SUMMARY_TOOLS[account_type].func()
+
+
+@tool
+def get_account(account_type: AccountTypeName, account_id: str):
+    """
+    Retrieves the details of one account, identified by its type and ID. Accounts
+    holding securities (Investment, IRAs, 401ks, HSA) are summarized like in
+    `summarize_accounts`, with current market data for their holdings.
+
+    Args:
+        account_type: The type of the account.
+        account_id: The ID of the account, see `list_accounts`.
+
+    Returns:
+        The account details, or an Exception when no account has this ID.
+    """
+    return _ACCOUNT_DETAIL_TOOLS[account_type].func(account_id)
+
+
+@tool
+def extract_account_tickers(
+    account_type: AccountTypeName, account_ids: list[str]
+) -> list[str]:
+    """
+    Returns the unique uppercase ticker symbols held in the given accounts of one
+    type, e.g. to look up their market data with `get_tickers_info`. Only
+    Investment, IRA, 401k and HSA accounts hold tickers.
+
+    Args:
+        account_type: The type of the accounts.
+        account_ids: The IDs of the accounts to scan, see `list_accounts`.
+    """
+    portfolio = user_data.get_portfolio()
+    accounts = getattr(
+        portfolio, f"{user_data.ACCOUNT_TYPES[account_type].family}_dict"
     )
 
-    return structured_response
+    tickers = set()
+    for account_id in account_ids:
+        account = accounts.get(account_id)
+        for asset in getattr(account, "asset_distribution", None) or []:
+            tickers.add(asset.ticker.upper())
+    return list(tickers)
+
+
+# Replace the per-type tools above, with a fraction of their schema
+ACCOUNT_TOOLS = [
+    list_accounts,
+    summarize_accounts,
+    get_account,
+    extract_account_tickers,
+]
@@ -0,0 +1,117 @@
+from operator import attrgetter
+
+import numpy as np
+
+
+def _parse_date(date: str | None) -> np.datetime64:
+    """
+    Returns `date` as a day, or NaT when it is missing or not an ISO YYYY-MM-DD date.
+    """
+    try:
+        return np.datetime64(date or "NaT", "D")
+    except ValueError:
+        return np.datetime64("NaT", "D")
+
+
+class TransactionColumns:
+    """
+    Billing-cycle transactions stored as columns: a float array of amounts, the
+    lower-cased categories interned to int codes, and, when the transactions
+    carry dates, a datetime64 array of dates (NaT where missing or unparseable).
+
+    Aggregations run over whole arrays instead of one transaction at a time.
+    """
+
+    def __init__(
+        self,
+        amounts: np.ndarray,
+        category_codes: np.ndarray,
+        categories: list[str],
+        dates: np.ndarray | None = None,
+    ):
+        self.amounts = amounts
+        self.category_codes = category_codes
+        # Code -> category, in the order the categories first appear
+        self.categories = categories
+        self.dates = dates
+
+    @classmethod
+    def from_transactions(cls, transactions) -> "TransactionColumns":
+        """
+        Builds the columns from BillingCycleTransaction objects.
+        """
+        transactions = list(transactions)
+        count = len(transactions)
+
+        amounts = np.fromiter(
+            map(attrgetter("amount"), transactions), dtype=np.float64, count=count
+        )
+
+        # Intern the raw categories first, so `lower` runs once per distinct category
+        raw_categories = list(map(attrgetter("category"), transactions))
+        raw_codes = {
+            raw: code for code, raw in enumerate(dict.fromkeys(raw_categories))
+        }
+        codes = np.fromiter(
+            map(raw_codes.__getitem__, raw_categories), dtype=np.intp, count=count
+        )
+        categories: dict[str, int] = {}
+        raw_to_code = np.array(
+            [categories.setdefault(raw.lower(), len(categories)) for raw in raw_codes],
+            dtype=np.intp,
+        )
+
+        dates = list(map(attrgetter("date"), transactions))
+        if any(dates):
+            try:
+                dates = np.array(
+                    [date or "NaT" for date in dates], dtype="datetime64[D]"
+                )
+            except ValueError:
+                # Dates are free-form, so parse them one at a time instead
+                dates = np.array(list(map(_parse_date, dates)), dtype="datetime64[D]")
+        else:
+            dates = None
+
+        return cls(amounts, raw_to_code[codes], list(categories), dates)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def total(self, mask: np.ndarray | None = None) -> float:
+        """
+        Returns the sum of the amounts, optionally of the transactions in `mask` only.
+        """
+        amounts = self.amounts if mask is None else self.amounts[mask]
+        return float(amounts.sum())
+
+    def totals_by_category(self, mask: np.ndarray | None = None) -> dict[str, float]:
+        """
+        Returns the summed amount per category, in the order the categories first
+        appear. `mask` optionally selects the transactions to aggregate, e.g.
+        `columns.dates >= np.datetime64("2025-01-01")`.
+        """
+        codes, amounts = self.category_codes, self.amounts
+        if mask is not None:
+            codes, amounts = codes[mask], amounts[mask]
+
+        totals = np.bincount(codes, weights=amounts, minlength=len(self.categories))
+        present = np.bincount(codes, minlength=len(self.categories)) > 0
+
+        return {
+            category: float(total)
+            for category, total, is_present in zip(self.categories, totals, present)
+            if is_present
+        }
+
+
+def transaction_columns(accounts) -> TransactionColumns:
+    """
+    Builds the columns of the current billing-cycle transactions of all the given
+    accounts. See `PortfolioContext.transaction_columns` for the memoized version.
+    """
+    return TransactionColumns.from_transactions(
+        txn
+        for account in accounts
+        for txn in account.current_billing_cycle_transactions
+    )
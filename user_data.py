@@ -1,32 +1,292 @@
+import contextlib
+import contextvars
+import hashlib
+import json
+from typing import Annotated, Union
+
+from pydantic import Discriminator, Tag, TypeAdapter
+
+from caching import SingleFlight
 from data_models import *
+from transactions import TransactionColumns, transaction_columns
+
+
+class PortfolioContext:
+    """
+    Personal details and accounts of a single user, scoped to one request.
+
+    Every request builds its own context, so concurrent chats never see each
+    other's accounts.
+    """
+
+    def __init__(self, user_details: UserDetails | None = None):
+        # Personal Details:
+        self.user_details = user_details
+
+        self.investment_accounts: list[InvestmentAccount] = []
+        self.credit_cards: list[CreditCard] = []
+        self.checking_accounts: list[CheckingOrSavingsAccount] = []
+        self.saving_accounts: list[CheckingOrSavingsAccount] = []
+        self.loans: list[Loan] = []
+        self.payrolls: list[Payroll] = []
+        self.traditional_iras: list[TraditionalIRA] = []
+        self.roth_iras: list[RothIRA] = []
+        self.retirement_401ks: list[Retirement401K] = []
+        self.roth_401ks: list[Roth401K] = []
+        self.hsa_accounts: list[HSAAccount] = []
+        self.other_accounts: list[OtherAccount] = []
+
+        # Dictionaries for faster access
+        self.investment_accounts_dict: dict[str, InvestmentAccount] = {}
+        self.credit_cards_dict: dict[str, CreditCard] = {}
+        self.checking_accounts_dict: dict[str, CheckingOrSavingsAccount] = {}
+        self.saving_accounts_dict: dict[str, CheckingOrSavingsAccount] = {}
+        self.loans_dict: dict[str, Loan] = {}
+        self.payrolls_dict: dict[str, Payroll] = {}
+        self.traditional_iras_dict: dict[str, TraditionalIRA] = {}
+        self.roth_iras_dict: dict[str, RothIRA] = {}
+        self.retirement_401ks_dict: dict[str, Retirement401K] = {}
+        self.roth_401ks_dict: dict[str, Roth401K] = {}
+        self.hsa_accounts_dict: dict[str, HSAAccount] = {}
+        self.other_accounts_dict: dict[str, OtherAccount] = {}
+
+        # Identifies these exact accounts across requests, e.g. (session id,
+        # version); None for a portfolio sent with a single request
+        self.cache_key: tuple | None = None
+        # Account family -> columns of its transactions, see `transaction_columns`
+        self._transaction_columns: dict[str, TransactionColumns] = {}
+        # Results derived from these accounts, see `memoized`
+        self._memo: dict = {}
+        self._memo_builds = SingleFlight()
+
+    def transaction_columns(self, family: str) -> TransactionColumns:
+        """
+        Returns the current billing-cycle transactions of the accounts of a family,
+        e.g. "credit_cards", as columns. Built once and shared by every aggregation
+        over the family.
+        """
+        if family not in self._transaction_columns:
+            self._transaction_columns[family] = transaction_columns(
+                getattr(self, family)
+            )
+        return self._transaction_columns[family]
+
+    def memoized(self, key, build):
+        """
+        Returns the result of `build` for `key`, computed at most once per version
+        of these accounts, even by concurrent tool calls. Used for portfolios
+        without a `cache_key`, whose results cannot be shared across requests.
+        """
+        if key in self._memo:
+            return self._memo[key]
+
+        def build_once():
+            if key not in self._memo:
+                self._memo[key] = build()
+            return self._memo[key]
+
+        return self._memo_builds.do(key, build_once)
+
+    def build_indexes(self):
+        """
+        Rebuilds the id -> account dictionaries from the account lists.
+        """
+        self._transaction_columns.clear()
+        self._memo.clear()
+        for family in ACCOUNT_FAMILIES:
+            setattr(
+                self,
+                f"{family}_dict",
+                {account.id: account for account in getattr(self, family)},
+            )
+
+    def copy(self) -> "PortfolioContext":
+        """
+        Returns a shallow copy: the account lists are new, the validated accounts
+        are shared.
+        """
+        portfolio = PortfolioContext(self.user_details)
+        for family in ACCOUNT_FAMILIES:
+            setattr(portfolio, family, list(getattr(self, family)))
+        portfolio.build_indexes()
+        return portfolio
+
+    def add_account(self, account: dict):
+        """
+        Validates a raw account and appends it to the list of its type. Accounts of
+        unknown types are ignored. Call `build_indexes` once done adding accounts.
+        """
+        account_type = ACCOUNT_TYPES.get(account["type"])
+        if account_type is not None:
+            getattr(self, account_type.family).append(account_type.model(**account))
+
+    def dump_accounts(self) -> list[dict]:
+        """
+        Returns the validated accounts as raw accounts, e.g. to persist them. Pass
+        them back to `build_portfolio` with ACCOUNT_SCHEMA_HASH to load them again
+        on the strict path.
+        """
+        return [
+            account.model_dump(mode="json") | {"type": name}
+            for name, account_type in ACCOUNT_TYPES.items()
+            for account in getattr(self, account_type.family)
+        ]
+
+    def remove_accounts(self, account_ids: set[str]):
+        """
+        Removes the accounts with the given ids, whatever their type. Call
+        `build_indexes` once done removing accounts.
+        """
+        for family in ACCOUNT_FAMILIES:
+            accounts = getattr(self, family)
+            if any(account.id in account_ids for account in accounts):
+                setattr(
+                    self,
+                    family,
+                    [account for account in accounts if account.id not in account_ids],
+                )
+
+
+class AccountType:
+    """
+    An account type of the `type` field of the raw accounts: the model its
+    accounts are validated into, and the PortfolioContext list (`family`) holding
+    them. The id index of a family is the `<family>_dict` attribute.
+    """
+
+    def __init__(self, name: str, model: type[BaseModel], family: str):
+        self.name = name
+        self.model = model
+        self.family = family
+
+
+# Account type name -> AccountType
+ACCOUNT_TYPES: dict[str, AccountType] = {
+    account_type.name: account_type
+    for account_type in (
+        AccountType("Investment", InvestmentAccount, "investment_accounts"),
+        AccountType("Credit Card", CreditCard, "credit_cards"),
+        AccountType("Checking", CheckingOrSavingsAccount, "checking_accounts"),
+        AccountType("Savings", CheckingOrSavingsAccount, "saving_accounts"),
+        AccountType("Loan", Loan, "loans"),
+        AccountType("Payroll", Payroll, "payrolls"),
+        AccountType("Traditional IRA", TraditionalIRA, "traditional_iras"),
+        AccountType("Roth IRA", RothIRA, "roth_iras"),
+        AccountType("Retirement 401k", Retirement401K, "retirement_401ks"),
+        AccountType("Roth 401k", Roth401K, "roth_401ks"),
+        AccountType("HSA", HSAAccount, "hsa_accounts"),
+        AccountType("Other", OtherAccount, "other_accounts"),
+    )
+}
+
+# Attributes of PortfolioContext holding a list of accounts
+ACCOUNT_FAMILIES = tuple(
+    dict.fromkeys(account_type.family for account_type in ACCOUNT_TYPES.values())
+)
+
+
+def _account_type_name(account) -> str | None:
+    if isinstance(account, dict):
+        return account.get("type")
+    return getattr(account, "type", None)
+
+
+# Validates a whole list of raw accounts in one pass, dispatching every account
+# to its model on its `type`
+ACCOUNTS_ADAPTER = TypeAdapter(
+    list[
+        Annotated[
+            Union[
+                tuple(
+                    Annotated[account_type.model, Tag(name)]
+                    for name, account_type in ACCOUNT_TYPES.items()
+                )
+            ],
+            Discriminator(_account_type_name),
+        ]
+    ]
+)
+
+
+# Hash of the schemas of the user details and of every account type. Payloads
+# dumped under the same hash are known to fit the models as they are.
+ACCOUNT_SCHEMA_HASH = hashlib.sha256(
+    json.dumps(
+        {
+            "UserDetails": UserDetails.model_json_schema(),
+            **{
+                name: account_type.model.model_json_schema()
+                for name, account_type in ACCOUNT_TYPES.items()
+            },
+        },
+        sort_keys=True,
+    ).encode()
+).hexdigest()
+
+
+def build_portfolio(
+    user_details: dict, accounts: list[dict], schema_hash: str | None = None
+) -> PortfolioContext:
+    """
+    Validates the raw user details and accounts of a request into a PortfolioContext.
+
+    Accounts of unknown types are ignored.
+
+    Args:
+        user_details: The raw user details.
+        accounts: The raw accounts, each with its account type in `type`.
+        schema_hash: For payloads that were already validated by this service,
+                     e.g. dumped by `PortfolioContext.dump_accounts` into a session
+                     store, the ACCOUNT_SCHEMA_HASH they were validated under.
+                     When it matches the current one, the payload is validated in
+                     strict mode, without the coercions raw client payloads need.
+    """
+    accounts = [account for account in accounts if account["type"] in ACCOUNT_TYPES]
+
+    if schema_hash is not None and schema_hash == ACCOUNT_SCHEMA_HASH:
+        # Strict mode skips the type coercions, which dumped payloads never need
+        portfolio = PortfolioContext(
+            UserDetails.model_validate(user_details, strict=True)
+        )
+        validated_accounts = ACCOUNTS_ADAPTER.validate_python(accounts, strict=True)
+    else:
+        portfolio = PortfolioContext(UserDetails(**user_details))
+        validated_accounts = ACCOUNTS_ADAPTER.validate_python(accounts)
+
+    # The lists and the id indexes are filled in the same pass
+    for account, validated_account in zip(accounts, validated_accounts):
+        family = ACCOUNT_TYPES[account["type"]].family
+        getattr(portfolio, family).append(validated_account)
+        getattr(portfolio, f"{family}_dict")[validated_account.id] = validated_account
+
+    return portfolio
+
+
+_CURRENT_PORTFOLIO: contextvars.ContextVar[PortfolioContext] = contextvars.ContextVar(
+    "current_portfolio"
+)
+
+
+def get_portfolio() -> PortfolioContext:
+    """
+    Returns the portfolio of the request being served.
+    """
+    try:
+        return _CURRENT_PORTFOLIO.get()
+    except LookupError:
+        raise RuntimeError("No portfolio is active for the current request") from None
+
+
+@contextlib.contextmanager
+def use_portfolio(portfolio: PortfolioContext):
+    """
+    Makes `portfolio` the active portfolio for the enclosed block.
 
-# Personal Details:
-
-USER_DETAILS = None
-
-INVESTMENT_ACCOUNTS = []
-CREDIT_CARDS = []
-CHECKING_ACCOUNTS = []
-SAVING_ACCOUNTS = []
-LOANS = []
-PAYROLLS = []
-TRADITIONAL_IRAS = []
-ROTH_IRAS = []
-RETIREMENT_401KS = []
-ROTH_401KS = []
-HSA_ACCOUNTS = []
-OTHER_ACCOUNTS = []
-
-# Dictionaries for faster access
-INVESTMENT_ACCOUNTS_DICT = {}
-CREDIT_CARDS_DICT = {}
-CHECKING_ACCOUNTS_DICT = {}
-SAVING_ACCOUNTS_DICT = {}
-LOANS_DICT = {}
-PAYROLLS_DICT = {}
-TRADITIONAL_IRAS_DICT = {}
-ROTH_IRAS_DICT = {}
-RETIREMENT_401KS_DICT = {}
-ROTH_401KS_DICT = {}
-HSA_ACCOUNTS_DICT = {}
-OTHER_ACCOUNTS_DICT = {}
+    The value lives in a context variable, so it follows the request into the
+    worker threads LangGraph uses to run nodes and tools.
+    """
+    token = _CURRENT_PORTFOLIO.set(portfolio)
+    try:
+        yield portfolio
+    finally:
+        _CURRENT_PORTFOLIO.reset(token)
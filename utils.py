@@ -1,4 +1,9 @@
 from data_models import *
+from caching import DiskCache, SingleFlight, TTLCache
+from gemini_client import async_gemini_client, gemini_client
+from holdings import HoldingsMatrix
+from metrics import StageTimings
+from quotes import GroundedQuoteProvider, create_quote_provider
 import user_data
 
 from google import genai
@@ -8,8 +13,22 @@ from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import datetime
+import functools
+import hashlib
+import json
+import logging
 import os
+import sqlite3
+import time
+
+import numpy as np
+from pydantic import TypeAdapter
+
+logger = logging.getLogger(__name__)
 
 
 def parse_messages_for_langgraph(messages_input):
@@ -51,19 +70,19 @@ def parse_messages_for_langgraph(messages_input):
     return processed_messages
 
 
-def get_structured_output_with_grounding(model, prompt, response_schema):
-    client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-
+def _grounded_search_config():
     google_search_tool = Tool(google_search=GoogleSearch())
 
-    grounding_response = client.models.generate_content(
-        model=model,
-        contents=prompt,
-        config=GenerateContentConfig(
-            tools=[google_search_tool], response_modalities=["TEXT"]
-        ),
+    return GenerateContentConfig(
+        tools=[google_search_tool], response_modalities=["TEXT"]
     )
 
+
+def _read_grounding_response(grounding_response):
+    """
+    Returns the text, the grounding chunks and the rendered search entry point of a
+    grounded response.
+    """
     response_text = "\n".join(
         [x.text for x in grounding_response.candidates[0].content.parts]
     )
@@ -74,20 +93,273 @@ def get_structured_output_with_grounding(model, prompt, response_schema):
         0
     ].grounding_metadata.search_entry_point.rendered_content
 
-    structured_prompt = (
-        f"{response_text}" "Convert the above into the respective JSON structure"
+    return response_text, grounding_chunks, entry_point_rendered
+
+
+def _structuring_prompt(response_text):
+    return f"{response_text}" "Convert the above into the respective JSON structure"
+
+
+def _structuring_config(response_schema):
+    return {
+        "response_mime_type": "application/json",
+        "response_schema": response_schema,
+    }
+
+
+# "single": one grounded call asked to answer in JSON, parsed locally; the
+# conversion call only runs when the answer does not parse.
+# "two_call": a grounded call, then a conversion call into the JSON structure.
+GROUNDING_MODE = os.getenv("GROUNDING_MODE", "single").lower()
+# Model of the conversion call, which only reformats text
+STRUCTURING_MODEL = os.getenv("STRUCTURING_MODEL", "gemini-2.0-flash-lite")
+
+
+def _single_call_prompt(prompt, response_schema):
+    json_schema = json.dumps(TypeAdapter(response_schema).json_schema())
+    return (
+        f"{prompt}\n\n"
+        "Respond only with JSON, without any other text, matching this JSON schema:\n"
+        f"{json_schema}"
     )
 
-    structured_response = client.models.generate_content(
-        model=model,
-        contents=structured_prompt,
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": response_schema,
-        },
+
+def _parse_structured_text(response_text, response_schema):
+    """
+    Parses the JSON of a model answer into `response_schema`, or returns None when
+    the answer holds no valid JSON for it.
+    """
+    text = response_text.strip()
+    # Drop a Markdown code fence around the JSON
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        return None
+    text = text[min(starts) : max(text.rfind("}"), text.rfind("]")) + 1]
+
+    try:
+        return TypeAdapter(response_schema).validate_json(text)
+    except ValueError:
+        return None
+
+
+# Per-stage timings of every grounded call made by this process, by mode and
+# stage, e.g. "single.search"; served by the /stats endpoint
+GROUNDING_TIMINGS = StageTimings()
+
+
+def _grounding_steps(model, prompt, response_schema):
+    """
+    The steps of a structured grounded call, shared by the sync and the async
+    versions: yields the keyword arguments of every `generate_content` call and is
+    sent its response, then returns the parsed answer, the grounding chunks and
+    the rendered search entry point.
+
+    The time spent in every stage is recorded in GROUNDING_TIMINGS and logged.
+    """
+    timings = []
+    single_call = GROUNDING_MODE == "single"
+
+    started = time.perf_counter()
+    grounding_response = yield {
+        "model": model,
+        "contents": (
+            _single_call_prompt(prompt, response_schema) if single_call else prompt
+        ),
+        "config": _grounded_search_config(),
+    }
+    timings.append(("search", time.perf_counter() - started))
+
+    response_text, grounding_chunks, entry_point_rendered = _read_grounding_response(
+        grounding_response
+    )
+
+    parsed = None
+    if single_call:
+        started = time.perf_counter()
+        parsed = _parse_structured_text(response_text, response_schema)
+        timings.append(("parse", time.perf_counter() - started))
+
+    if parsed is None:
+        started = time.perf_counter()
+        structured_response = yield {
+            "model": STRUCTURING_MODEL if single_call else model,
+            "contents": _structuring_prompt(response_text),
+            "config": _structuring_config(response_schema),
+        }
+        parsed = structured_response.parsed
+        timings.append(("structure", time.perf_counter() - started))
+
+    for stage, seconds in timings:
+        GROUNDING_TIMINGS.record(f"{GROUNDING_MODE}.{stage}", seconds)
+    logger.info(
+        "Structured grounding (%s, %s): %s",
+        GROUNDING_MODE,
+        model,
+        ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in timings),
+    )
+
+    return parsed, grounding_chunks, entry_point_rendered
+
+
+# Identical grounded calls in flight at the same time, from any request, are
+# made once and share their result
+GROUNDING_CALLS = SingleFlight()
+
+
+def _grounding_call_key(model, prompt, response_schema):
+    return model, " ".join(prompt.split()), repr(response_schema)
+
+
+def get_structured_output_with_grounding(model, prompt, response_schema):
+    """
+    Answers `prompt` with grounded search and returns the answer as `response_schema`,
+    with the grounding chunks and the rendered search entry point.
+
+    See GROUNDING_MODE for how the answer is turned into the structure. The time
+    spent in every stage is recorded in GROUNDING_TIMINGS. Concurrent identical calls are coalesced into
+    one, and the callers share the returned objects.
+    """
+    return GROUNDING_CALLS.do(
+        _grounding_call_key(model, prompt, response_schema),
+        lambda: _get_structured_output_with_grounding(model, prompt, response_schema),
     )
 
-    return structured_response.parsed, grounding_chunks, entry_point_rendered
+
+def _get_structured_output_with_grounding(model, prompt, response_schema):
+    steps = _grounding_steps(model, prompt, response_schema)
+    with gemini_client() as client:
+        request = next(steps)
+        try:
+            while True:
+                request = steps.send(client.models.generate_content(**request))
+        except StopIteration as done:
+            return done.value
+
+
+async def aget_structured_output_with_grounding(model, prompt, response_schema):
+    """
+    Async version of `get_structured_output_with_grounding`, using the async Gemini client.
+    """
+    return await GROUNDING_CALLS.ado(
+        _grounding_call_key(model, prompt, response_schema),
+        lambda: _aget_structured_output_with_grounding(model, prompt, response_schema),
+    )
+
+
+async def _aget_structured_output_with_grounding(model, prompt, response_schema):
+    steps = _grounding_steps(model, prompt, response_schema)
+    async with async_gemini_client() as client:
+        request = next(steps)
+        try:
+            while True:
+                request = steps.send(
+                    await client.aio.models.generate_content(**request)
+                )
+        except StopIteration as done:
+            return done.value
+
+
+# Answers of grounded searches that change slowly, e.g. card or market lists,
+# kept on disk and shared by the workers of a host. Set RESPONSE_CACHE_PATH to
+# an empty string to disable it.
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "responses.sqlite3")
+RESPONSE_CACHE = (
+    DiskCache(
+        RESPONSE_CACHE_PATH,
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+    )
+    if RESPONSE_CACHE_PATH
+    else None
+)
+
+
+def _normalize_query(query):
+    if isinstance(query, str):
+        return " ".join(query.lower().split())
+    if isinstance(query, dict):
+        return {key: _normalize_query(value) for key, value in query.items()}
+    if isinstance(query, (list, tuple)):
+        return [_normalize_query(value) for value in query]
+    return query
+
+
+def response_cache_key(name: str, model: str, query) -> str:
+    """
+    Returns the RESPONSE_CACHE key of a query to a tool: the tool name, the model,
+    the query with the case and whitespace of its strings normalized, and the
+    current UTC date, so answers are never reused across days.
+
+    The query is a string, or the JSON-serializable arguments of the tool.
+    """
+    return hashlib.sha256(
+        json.dumps(
+            [
+                name,
+                model,
+                _normalize_query(query),
+                datetime.datetime.now(datetime.timezone.utc).date().isoformat(),
+            ],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+def _read_response_cache(key):
+    try:
+        return RESPONSE_CACHE.get(key)
+    except sqlite3.Error:
+        logger.warning("Could not read the response cache", exc_info=True)
+        return None
+
+
+def _write_response_cache(key, response, ttl):
+    try:
+        RESPONSE_CACHE.set(key, response, ttl)
+    except sqlite3.Error:
+        logger.warning("Could not write the response cache", exc_info=True)
+
+
+def cached_response(name: str, model: str, query, ttl, answer) -> str:
+    """
+    Returns the answer of `query` from RESPONSE_CACHE, or calls `answer()` and caches
+    its result for `ttl` seconds. The cache is skipped when `ttl` is None or the
+    cache is disabled; errors of the cache itself are only logged.
+
+    Args:
+        name: The name of the tool answering the query.
+        model: The model answering the query.
+        query: The query, or the arguments of the tool, see `response_cache_key`.
+        ttl: How long the answer stays valid, in seconds.
+        answer: Computes the answer, a string.
+    """
+    if RESPONSE_CACHE is None or ttl is None:
+        return answer()
+
+    key = response_cache_key(name, model, query)
+    response = _read_response_cache(key)
+    if response is None:
+        response = answer()
+        _write_response_cache(key, response, ttl)
+    return response
+
+
+async def acached_response(name: str, model: str, query, ttl, answer) -> str:
+    """
+    Async version of `cached_response`; `answer()` returns the awaitable to run.
+    """
+    if RESPONSE_CACHE is None or ttl is None:
+        return await answer()
+
+    key = response_cache_key(name, model, query)
+    response = await asyncio.to_thread(_read_response_cache, key)
+    if response is None:
+        response = await answer()
+        await asyncio.to_thread(_write_response_cache, key, response, ttl)
+    return response
 
 
 # Personal Details
@@ -100,7 +372,15 @@ def anonymize_user_personal_details(user_details) -> UserDetails:
 # Investment Accounts
 
 
-def retrieve_tickers_info(tickers: list[str]) -> list[TickerInformation]:
+# Market data moves quickly, so ticker information is only reused for a short
+# while. Shared by every request served by this process.
+TICKER_INFO_CACHE = TTLCache(
+    maxsize=int(os.getenv("TICKER_INFO_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TICKER_INFO_TTL_SECONDS", "60")),
+)
+
+
+def fetch_tickers_info(tickers: list[str]) -> list[TickerInformation]:
     prompt = f"""
 Objective: Retrieve detailed, current financial information for each specified stock ticker using grounded web search.
 
@@ -134,6 +414,118 @@ Instructions:
     return structured_response
 
 
+def fetch_tickers_news(tickers: list[str]) -> list[TickerNews]:
+    prompt = f"""
+Objective: Summarize the latest market news for each specified stock ticker using grounded web search.
+
+Instructions:
+
+1.  Identify Tickers: Process the following list of stock tickers:
+    * `Tickers: {', '.join(tickers)}`
+
+2.  For *each* ticker, use grounded web search to find the most relevant market news as of {datetime.date.today().isoformat()} and summarize it in 1-2 paragraphs.
+
+3.  Required Data Fields per Ticker:
+    * `Ticker Symbol` (Map this to 'ticker' in the final JSON object)
+    * `Company Name` (Map to 'company_name')
+    * `Summary of latest market news` (Map to 'summary_of_latest_market_news')
+"""
+
+    (structured_response, _, _) = get_structured_output_with_grounding(
+        "gemini-2.0-flash", prompt, list[TickerNews]
+    )
+
+    return structured_response
+
+
+# Where ticker information comes from, see `quotes.create_quote_provider`. The
+# lambdas look the fetchers up on every call, so they can be swapped at runtime.
+QUOTE_PROVIDER = create_quote_provider(
+    GroundedQuoteProvider(
+        lambda tickers: fetch_tickers_info(tickers),
+        lambda tickers: fetch_tickers_news(tickers),
+    )
+)
+
+
+def retrieve_tickers_info(tickers: list[str]) -> list[TickerInformation]:
+    """
+    Returns the information of the given tickers, in the order they were given.
+
+    Tickers found in `TICKER_INFO_CACHE` are served from it; only the missing or
+    stale ones are fetched from `QUOTE_PROVIDER`, and the fetched results are added
+    to the cache.
+    """
+    requested = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+
+    tickers_info = {}
+    missing = []
+    for ticker in requested:
+        ticker_info = TICKER_INFO_CACHE.get(ticker)
+        if ticker_info is None:
+            missing.append(ticker)
+        else:
+            tickers_info[ticker] = ticker_info
+
+    if missing:
+        for ticker_info in QUOTE_PROVIDER.get_quotes(missing):
+            ticker = ticker_info.ticker.upper()
+            TICKER_INFO_CACHE.set(ticker, ticker_info)
+            tickers_info[ticker] = ticker_info
+
+    return [tickers_info[ticker] for ticker in requested if ticker in tickers_info]
+
+
+def extract_unique_tickers(
+    *account_families: (
+        list[InvestmentAccount]
+        | list[TraditionalIRA]
+        | list[RothIRA]
+        | list[Retirement401K]
+        | list[Roth401K]
+        | list[HSAAccount]
+    ),
+) -> list[str]:
+    """
+    Returns the sorted, uppercase tickers held across all of the given account families.
+    """
+    return sorted(
+        {
+            asset.ticker.upper()
+            for accounts in account_families
+            for account in accounts
+            for asset in account.asset_distribution
+        }
+    )
+
+
+def get_quote_snapshot(
+    *account_families: (
+        list[InvestmentAccount]
+        | list[TraditionalIRA]
+        | list[RothIRA]
+        | list[Retirement401K]
+        | list[Roth401K]
+        | list[HSAAccount]
+    ),
+) -> dict[str, TickerInformation]:
+    """
+    Resolves the union of the tickers held across the given account families at once.
+
+    Passing the snapshot to every `summary_of_assets` call of an answer avoids
+    duplicate lookups and keeps the prices consistent between the summaries.
+
+    Returns:
+        dict: Uppercase ticker -> TickerInformation.
+    """
+    return {
+        ticker_info.ticker.upper(): ticker_info
+        for ticker_info in retrieve_tickers_info(
+            extract_unique_tickers(*account_families)
+        )
+    }
+
+
 def summary_of_assets(
     accounts: (
         list[InvestmentAccount]
@@ -143,104 +535,146 @@ def summary_of_assets(
         | list[Roth401K]
         | list[HSAAccount]
     ),
+    quotes: dict[str, TickerInformation] | None = None,
 ) -> dict[str, TickerInformationInSummary]:
     """
     Provides a summary of all assets in the investment accounts.
 
+    Args:
+        accounts: The accounts whose assets are summarized.
+        quotes: A quote snapshot (see `get_quote_snapshot`) covering the tickers of the
+                accounts. When omitted, a snapshot is taken for these accounts only.
+
     Returns:
         dict: Dictionary containing summarized information for each asset.
     """
-    summary = defaultdict(
-        lambda: {"total_quantity": 0, "weighted_cost_basis": 0, "count": 0}
-    )
-
-    for portfolio in accounts:
-        for asset in portfolio.asset_distribution:
-            ticker = asset.ticker.upper()
-            quantity = float(asset.quantity)
-            cost_basis = float(asset.average_cost_basis)
-
-            s = summary[ticker]
-            s["total_quantity"] += quantity
-            s["weighted_cost_basis"] += cost_basis * quantity
-            s["count"] += 1
-
-    # Finalize averages and cost basis
-    for ticker, data in summary.items():
-        if data["total_quantity"] > 0:
-            data["average_cost_basis"] = round(
-                data["weighted_cost_basis"] / data["total_quantity"], 2
-            )
-        else:
-            data["average_cost_basis"] = 0
-
-        del data["weighted_cost_basis"]
-        del data["count"]
-
-    tickers = sorted(summary.keys())
-    tickers_info = retrieve_tickers_info(tickers)
-
-    for ticker_info in tickers_info:
-        ticker = ticker_info.ticker.upper()
-        if ticker in summary:
-            summary[ticker].update(
-                {
-                    "company_name": ticker_info.company_name,
-                    "current_price": ticker_info.current_price,
-                    "daily_price_change": ticker_info.daily_price_change,
-                    "weekly_price_change": ticker_info.weekly_price_change,
-                    "monthly_price_change": ticker_info.monthly_price_change,
-                    "ytd_price_change": ticker_info.ytd_price_change,
-                    "MA50": ticker_info.MA50,
-                    "MA100": ticker_info.MA100,
-                    "high_52_week": ticker_info.high_52_week,
-                    "low_52_week": ticker_info.low_52_week,
-                    "volume": ticker_info.volume,
-                    "summary_of_latest_market_news": ticker_info.summary_of_latest_market_news,
-                }
-            )
+    holdings = HoldingsMatrix.from_accounts(accounts)
 
-    for ticker, summary_item in summary.items():
-        summary_item["total_value_change"] = round(
-            summary_item["total_quantity"]
-            * (summary_item["current_price"] - summary_item["average_cost_basis"]),
-            2,
-        )
+    if quotes is None:
+        quotes = get_quote_snapshot(accounts)
 
-        summary[ticker] = TickerInformationInSummary(**summary_item)
+    total_quantities = holdings.total_quantities()
+    # Rounded before measuring the value change, as shown to the user
+    average_cost_bases = np.array(
+        [round(float(cost_basis), 2) for cost_basis in holdings.average_cost_bases()]
+    )
+    ticker_infos = [quotes[ticker] for ticker in holdings.tickers]
+    value_changes = holdings.unrealized_pnl(
+        np.array([ticker_info.current_price for ticker_info in ticker_infos]),
+        cost_bases=average_cost_bases,
+    )
 
-    return dict(summary)
+    return {
+        ticker: TickerInformationInSummary(
+            total_quantity=total_quantity,
+            average_cost_basis=average_cost_basis,
+            company_name=ticker_info.company_name,
+            current_price=ticker_info.current_price,
+            daily_price_change=ticker_info.daily_price_change,
+            weekly_price_change=ticker_info.weekly_price_change,
+            monthly_price_change=ticker_info.monthly_price_change,
+            ytd_price_change=ticker_info.ytd_price_change,
+            MA50=ticker_info.MA50,
+            MA100=ticker_info.MA100,
+            high_52_week=ticker_info.high_52_week,
+            low_52_week=ticker_info.low_52_week,
+            volume=ticker_info.volume,
+            summary_of_latest_market_news=ticker_info.summary_of_latest_market_news,
+            total_value_change=round(value_change, 2),
+        )
+        for ticker, total_quantity, average_cost_basis, ticker_info, value_change in zip(
+            holdings.tickers,
+            total_quantities.tolist(),
+            average_cost_bases.tolist(),
+            ticker_infos,
+            value_changes.tolist(),
+        )
+    }
 
 
-def get_summary_of_investment_accounts() -> SummaryOfInvestmentAccounts:
+def get_summary_of_investment_accounts(
+    quotes: dict[str, TickerInformation] | None = None,
+) -> SummaryOfInvestmentAccounts:
     """
     Provides a summary of all investment accounts.
     """
+    portfolio = user_data.get_portfolio()
     result = {
         "total_uninvested_amount": sum(
-            account.uninvested_amount for account in user_data.INVESTMENT_ACCOUNTS
+            account.uninvested_amount for account in portfolio.investment_accounts
+        ),
+        "invested_securities_info": summary_of_assets(
+            portfolio.investment_accounts, quotes
         ),
-        "invested_securities_info": summary_of_assets(user_data.INVESTMENT_ACCOUNTS),
     }
 
     return SummaryOfInvestmentAccounts(**result)
 
 
+# Summaries computed only from the accounts of a session, keyed by the session
+# version. Shared by every request served by this process.
+SUMMARY_CACHE = TTLCache(
+    maxsize=int(os.getenv("SUMMARY_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "3600")),
+)
+
+
+def cached_summary(build_summary):
+    """
+    Caches a summary builder in `SUMMARY_CACHE`, keyed by its arguments and the
+    `cache_key` of the active portfolio. Portfolios without one, sent with a
+    single request, keep their summaries on the portfolio instead, see
+    `PortfolioContext.memoized`.
+
+    Both the summary and its rendered string are stored: the decorated function
+    returns the summary, and its `rendered` attribute returns the string. Cached
+    summaries are shared between requests and must not be modified.
+    """
+
+    def build(*args, **kwargs):
+        summary = build_summary(*args, **kwargs)
+        return summary, str(summary)
+
+    def entry(*args, **kwargs):
+        portfolio = user_data.get_portfolio()
+        key = (build_summary.__name__, args, tuple(sorted(kwargs.items())))
+        if portfolio.cache_key is None:
+            return portfolio.memoized(key, lambda: build(*args, **kwargs))
+
+        key += (portfolio.cache_key,)
+        cached = SUMMARY_CACHE.get(key)
+        if cached is None:
+            cached = build(*args, **kwargs)
+            SUMMARY_CACHE.set(key, cached)
+        return cached
+
+    @functools.wraps(build_summary)
+    def wrapper(*args, **kwargs):
+        return entry(*args, **kwargs)[0]
+
+    def rendered(*args, **kwargs):
+        return entry(*args, **kwargs)[1]
+
+    wrapper.rendered = rendered
+    return wrapper
+
+
+@cached_summary
 def get_summary_of_credit_cards() -> SummaryOfCreditCards:
     """
     Provides a summary of all credit cards.
     """
+    portfolio = user_data.get_portfolio()
     total_limit = 0
     available_credit = 0
     outstanding_debt = 0
-    category_spending = defaultdict(float)
     rewards_summary = ""
     aprs = []
     weighted_average_interest_rate_applied_on_debt = 0
     weighted_apr = 0
     total_annual_fees = 0
 
-    for card in user_data.CREDIT_CARDS:
+    for card in portfolio.credit_cards:
         total_limit += float(card.total_limit)
         available_credit += float(card.current_limit)
         outstanding_debt += float(card.outstanding_debt)
@@ -254,13 +688,13 @@ def get_summary_of_credit_cards() -> SummaryOfCreditCards:
                 apr * card.outstanding_debt
             )
 
-        for txn in card.current_billing_cycle_transactions:
-            amount = float(txn.amount)
-            category = txn.category.lower()
-            category_spending[category] += amount
-
         rewards_summary += f"{card.name}: {card.rewards_summary}\n"
 
+    # Spending by category across the transactions of every card
+    category_spending = portfolio.transaction_columns(
+        "credit_cards"
+    ).totals_by_category()
+
     if weighted_average_interest_rate_applied_on_debt > 0 and weighted_apr > 0:
         weighted_average_interest_rate_applied_on_debt = (
             weighted_average_interest_rate_applied_on_debt / weighted_apr
@@ -282,20 +716,20 @@ def get_summary_of_credit_cards() -> SummaryOfCreditCards:
     return SummaryOfCreditCards(**result)
 
 
+@cached_summary
 def get_summary_of_checking_or_savings_accounts(
     is_checking: bool,
 ) -> SummaryOfCheckingOrSavingsAccounts:
     """
     Provides a summary of all checking or savings accounts.
     """
-    accounts = user_data.CHECKING_ACCOUNTS if is_checking else user_data.SAVING_ACCOUNTS
+    portfolio = user_data.get_portfolio()
+    accounts = portfolio.checking_accounts if is_checking else portfolio.saving_accounts
 
     total_balance = 0.0
-    net_flow = 0.0
     interest_rates = []
     fee_totals = defaultdict(float)
     fee_counts = defaultdict(int)
-    category_spending = defaultdict(float)
     rewards_summary = ""
 
     for acc in accounts:
@@ -310,13 +744,6 @@ def get_summary_of_checking_or_savings_accounts(
         if interest is not None:
             interest_rates.append(interest)
 
-        # Transaction Flow (Current Cycle)
-        for txn in acc.current_billing_cycle_transactions:
-            amount = float(txn.amount)
-            category = txn.category.lower()
-            category_spending[category] += amount
-            net_flow += amount
-
         # Fee Aggregation
         fees = acc.fee
 
@@ -332,6 +759,13 @@ def get_summary_of_checking_or_savings_accounts(
         fee_totals["no_minimum_balance_fee"] += fees.overdraft_fee
         fee_counts["no_minimum_balance_fee"] += 1
 
+    # Transaction Flow (Current Cycle)
+    transactions = portfolio.transaction_columns(
+        "checking_accounts" if is_checking else "saving_accounts"
+    )
+    net_flow = transactions.total()
+    category_spending = transactions.totals_by_category()
+
     def safe_avg(totals, counts, key):
         return round(totals[key] / counts[key], 2) if counts[key] else 0.0
 
@@ -356,93 +790,111 @@ def get_summary_of_checking_or_savings_accounts(
     return SummaryOfCheckingOrSavingsAccounts(**result)
 
 
-def get_summary_of_traditional_ira_accounts() -> SummaryOfIRAAccounts:
+def get_summary_of_traditional_ira_accounts(
+    quotes: dict[str, TickerInformation] | None = None,
+) -> SummaryOfIRAAccounts:
     """
     Provides a summary of all of the traditional ira accounts.
 
     Returns:
         list: List of dictionaries containing summarized information for each of the traditional ira account.
     """
+    portfolio = user_data.get_portfolio()
     result = {
         "total_uninvested_amount": sum(
-            account.uninvested_amount for account in user_data.TRADITIONAL_IRAS
+            account.uninvested_amount for account in portfolio.traditional_iras
         ),
         "total_average_monthly_contribution": sum(
             account.average_monthly_contribution
-            for account in user_data.TRADITIONAL_IRAS
+            for account in portfolio.traditional_iras
+        ),
+        "invested_securities_info": summary_of_assets(
+            portfolio.traditional_iras, quotes
         ),
-        "invested_securities_info": summary_of_assets(user_data.TRADITIONAL_IRAS),
     }
 
     return SummaryOfIRAAccounts(**result)
 
 
-def get_summary_of_roth_ira_accounts() -> SummaryOfIRAAccounts:
+def get_summary_of_roth_ira_accounts(
+    quotes: dict[str, TickerInformation] | None = None,
+) -> SummaryOfIRAAccounts:
     """
     Provides a summary of all of the roth ira accounts.
 
     Returns:
         list: List of dictionaries containing summarized information for each of the roth ira account.
     """
+    portfolio = user_data.get_portfolio()
     result = {
         "total_uninvested_amount": sum(
-            account.uninvested_amount for account in user_data.ROTH_IRAS
+            account.uninvested_amount for account in portfolio.roth_iras
         ),
         "total_average_monthly_contribution": sum(
-            account.average_monthly_contribution for account in user_data.ROTH_IRAS
+            account.average_monthly_contribution for account in portfolio.roth_iras
         ),
-        "invested_securities_info": summary_of_assets(user_data.ROTH_IRAS),
+        "invested_securities_info": summary_of_assets(portfolio.roth_iras, quotes),
     }
 
     return SummaryOfIRAAccounts(**result)
 
 
-def get_summary_of_401k_accounts() -> SummaryOf401kAccounts:
+def get_summary_of_401k_accounts(
+    quotes: dict[str, TickerInformation] | None = None,
+) -> SummaryOf401kAccounts:
     """
     Provides a summary of all of the 401(k) accounts.
     """
+    portfolio = user_data.get_portfolio()
     result = {
         "total_uninvested_amount": sum(
-            account.uninvested_amount for account in user_data.RETIREMENT_401KS
+            account.uninvested_amount for account in portfolio.retirement_401ks
         ),
         "total_average_monthly_contribution": sum(
             account.average_monthly_contribution
-            for account in user_data.RETIREMENT_401KS
+            for account in portfolio.retirement_401ks
         ),
         "employer_matches_summary": ", \n".join(
-            account.employer_match for account in user_data.RETIREMENT_401KS
+            account.employer_match for account in portfolio.retirement_401ks
+        ),
+        "invested_securities_info": summary_of_assets(
+            portfolio.retirement_401ks, quotes
         ),
-        "invested_securities_info": summary_of_assets(user_data.RETIREMENT_401KS),
     }
 
     return SummaryOf401kAccounts(**result)
 
 
-def get_summary_of_roth_401k_accounts() -> SummaryOf401kAccounts:
+def get_summary_of_roth_401k_accounts(
+    quotes: dict[str, TickerInformation] | None = None,
+) -> SummaryOf401kAccounts:
     """
     Provides a summary of all of the Roth 401(k) accounts.
     """
+    portfolio = user_data.get_portfolio()
     result = {
         "total_uninvested_amount": sum(
-            account.uninvested_amount for account in user_data.ROTH_401KS
+            account.uninvested_amount for account in portfolio.roth_401ks
         ),
         "total_average_monthly_contribution": sum(
-            account.average_monthly_contribution for account in user_data.ROTH_401KS
+            account.average_monthly_contribution for account in portfolio.roth_401ks
         ),
         "employer_matches_summary": ", \n".join(
-            account.employer_match for account in user_data.ROTH_401KS
+            account.employer_match for account in portfolio.roth_401ks
         ),
-        "invested_securities_info": summary_of_assets(user_data.ROTH_401KS),
+        "invested_securities_info": summary_of_assets(portfolio.roth_401ks, quotes),
     }
 
     return SummaryOf401kAccounts(**result)
 
 
+@cached_summary
 def get_summary_of_loan_accounts() -> SummaryOfLoanAccounts:
     """
     Provides a summary of all of the loan accounts.
     """
-    total_loans = len(user_data.LOANS)
+    portfolio = user_data.get_portfolio()
+    total_loans = len(portfolio.loans)
     total_outstanding = 0.0
     total_paid = 0.0
     total_principal = 0.0
@@ -456,7 +908,7 @@ def get_summary_of_loan_accounts() -> SummaryOfLoanAccounts:
     loans_with_prepay_penalty = 0
     active_loans = 0
 
-    for loan in user_data.LOANS:
+    for loan in portfolio.loans:
         # Basic financials
         outstanding = loan.outstanding_balance
         paid = loan.total_paid
@@ -533,10 +985,12 @@ def get_summary_of_loan_accounts() -> SummaryOfLoanAccounts:
     return SummaryOfLoanAccounts(**result)
 
 
+@cached_summary
 def get_summary_of_payroll_accounts() -> SummaryOfPayrollAccounts:
     """
     Provides a summary of all of the payroll accounts.
     """
+    portfolio = user_data.get_portfolio()
     total_gross = 0.0
     total_net = 0.0
     total_bonus = 0.0
@@ -551,7 +1005,7 @@ def get_summary_of_payroll_accounts() -> SummaryOfPayrollAccounts:
     frequencies = defaultdict(int)
     all_benefits = ""
 
-    for record in user_data.PAYROLLS:
+    for record in portfolio.payrolls:
         total_gross += record.annual_income
         total_net += record.net_income
         total_bonus += record.bonus_income
@@ -574,7 +1028,7 @@ def get_summary_of_payroll_accounts() -> SummaryOfPayrollAccounts:
             ytd_max = ytd
 
     result = {
-        "total_entries": len(user_data.PAYROLLS),
+        "total_entries": len(portfolio.payrolls),
         "total_annual_income": round(total_gross, 2),
         "total_net_income": round(total_net, 2),
         "total_bonus_income": round(total_bonus, 2),
@@ -594,97 +1048,196 @@ def get_summary_of_payroll_accounts() -> SummaryOfPayrollAccounts:
     return SummaryOfPayrollAccounts(**result)
 
 
+@cached_summary
 def get_summary_of_other_accounts() -> SummaryOfOtherAccounts:
     """
     Provides a summary of all of the other accounts.
 
     """
+    portfolio = user_data.get_portfolio()
     return SummaryOfOtherAccounts(
-        total_income=sum(account.total_income for account in user_data.OTHER_ACCOUNTS),
-        total_debt=sum(account.total_debt for account in user_data.OTHER_ACCOUNTS),
+        total_income=sum(account.total_income for account in portfolio.other_accounts),
+        total_debt=sum(account.total_debt for account in portfolio.other_accounts),
     )
 
 
-def get_summary_of_hsa_accounts() -> SummaryOfHSAAccounts:
+def get_summary_of_hsa_accounts(
+    quotes: dict[str, TickerInformation] | None = None,
+) -> SummaryOfHSAAccounts:
     """
     Provides a summary of all of the HSA accounts.
     """
+    portfolio = user_data.get_portfolio()
     result = {
         "total_uninvested_amount": sum(
-            account.uninvested_amount for account in user_data.HSA_ACCOUNTS
+            account.uninvested_amount for account in portfolio.hsa_accounts
         ),
         "total_average_monthly_contribution": sum(
-            account.average_monthly_contribution for account in user_data.HSA_ACCOUNTS
+            account.average_monthly_contribution for account in portfolio.hsa_accounts
         ),
-        "invested_securities_info": summary_of_assets(user_data.HSA_ACCOUNTS),
+        "invested_securities_info": summary_of_assets(portfolio.hsa_accounts, quotes),
     }
 
     return SummaryOfHSAAccounts(**result)
 
 
-def get_user_financial_summary():
+# Sections of the financial summary that depend on market data
+ASSET_SUMMARY_SECTIONS = (
+    "investment_summary",
+    "traditional_ira_summary",
+    "roth_ira_summary",
+    "retirement_401k_summary",
+    "roth_401k_summary",
+    "hsa_summary",
+)
+
+
+# Financial summaries, keyed by the `cache_key` of the session portfolio: a new
+# version of the user's details or accounts gets a new snapshot. The TTL bounds
+# the age of the market data in the snapshots.
+FINANCIAL_SNAPSHOTS = TTLCache(
+    maxsize=int(os.getenv("FINANCIAL_SNAPSHOT_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("FINANCIAL_SNAPSHOT_TTL_SECONDS", "900")),
+)
+# Concurrent plan tools of the same accounts wait for a single build
+FINANCIAL_SNAPSHOT_BUILDS = SingleFlight()
+
+
+def get_user_financial_summary() -> dict[str, str]:
+    """
+    Returns the snapshot of the user's financial situation, see
+    `build_user_financial_summary`.
+
+    The snapshot is built once per session version, and shared by every plan tool
+    of every request on that version until it expires. Portfolios sent with a
+    single request keep theirs on the portfolio, so the plan tools of a request
+    share it. It must not be modified.
+    """
+    portfolio = user_data.get_portfolio()
+    cache_key = portfolio.cache_key
+    if cache_key is None:
+        return portfolio.memoized("financial_summary", build_user_financial_summary)
+
+    snapshot = FINANCIAL_SNAPSHOTS.get(cache_key)
+    if snapshot is None:
+
+        def build():
+            snapshot = build_user_financial_summary()
+            FINANCIAL_SNAPSHOTS.set(cache_key, snapshot)
+            return snapshot
+
+        snapshot = FINANCIAL_SNAPSHOT_BUILDS.do(cache_key, build)
+    return snapshot
+
+
+def build_user_financial_summary() -> dict[str, str]:
     """
     Provides a summary of the user's financial situation.
+
+    The tickers of every asset family are resolved with a single lookup, run
+    while the summaries that only need the accounts are built, and the asset
+    family summaries are then computed from that snapshot.
     """
+    portfolio = user_data.get_portfolio()
 
-    return {
-        "user_details": str(anonymize_user_personal_details(user_data.USER_DETAILS)),
+    # Section -> (accounts, summary builder, placeholder when there are no accounts)
+    sections = {
         "investment_summary": (
-            str(get_summary_of_investment_accounts())
-            if user_data.INVESTMENT_ACCOUNTS
-            else "NO INVESTMENT ACCOUNTS"
+            portfolio.investment_accounts,
+            get_summary_of_investment_accounts,
+            "NO INVESTMENT ACCOUNTS",
         ),
         "credit_card_summary": (
-            str(get_summary_of_credit_cards())
-            if user_data.CREDIT_CARDS
-            else "NO CREDIT CARDS"
+            portfolio.credit_cards,
+            get_summary_of_credit_cards.rendered,
+            "NO CREDIT CARDS",
         ),
         "checking_summary": (
-            str(get_summary_of_checking_or_savings_accounts(is_checking=True))
-            if user_data.CHECKING_ACCOUNTS
-            else "NO CHECKING ACCOUNTS"
+            portfolio.checking_accounts,
+            lambda: get_summary_of_checking_or_savings_accounts.rendered(
+                is_checking=True
+            ),
+            "NO CHECKING ACCOUNTS",
         ),
         "saving_summary": (
-            str(get_summary_of_checking_or_savings_accounts(is_checking=False))
-            if user_data.SAVING_ACCOUNTS
-            else "NO SAVING ACCOUNTS"
+            portfolio.saving_accounts,
+            lambda: get_summary_of_checking_or_savings_accounts.rendered(
+                is_checking=False
+            ),
+            "NO SAVING ACCOUNTS",
         ),
         "loans_summary": (
-            str(get_summary_of_loan_accounts()) if user_data.LOANS else "NO LOANS"
+            portfolio.loans,
+            get_summary_of_loan_accounts.rendered,
+            "NO LOANS",
         ),
         "payrolls_summary": (
-            str(get_summary_of_payroll_accounts())
-            if user_data.PAYROLLS
-            else "NO PAYROLLS"
+            portfolio.payrolls,
+            get_summary_of_payroll_accounts.rendered,
+            "NO PAYROLLS",
         ),
         "traditional_ira_summary": (
-            str(get_summary_of_traditional_ira_accounts())
-            if user_data.TRADITIONAL_IRAS
-            else "NO TRADITIONAL IRAS"
+            portfolio.traditional_iras,
+            get_summary_of_traditional_ira_accounts,
+            "NO TRADITIONAL IRAS",
         ),
         "roth_ira_summary": (
-            str(get_summary_of_roth_ira_accounts())
-            if user_data.ROTH_IRAS
-            else "NO ROTH IRAS"
+            portfolio.roth_iras,
+            get_summary_of_roth_ira_accounts,
+            "NO ROTH IRAS",
         ),
         "retirement_401k_summary": (
-            str(get_summary_of_401k_accounts())
-            if user_data.RETIREMENT_401KS
-            else "NO RETIREMENT 401K"
+            portfolio.retirement_401ks,
+            get_summary_of_401k_accounts,
+            "NO RETIREMENT 401K",
         ),
         "roth_401k_summary": (
-            str(get_summary_of_roth_401k_accounts())
-            if user_data.ROTH_401KS
-            else "NO ROTH 401K"
+            portfolio.roth_401ks,
+            get_summary_of_roth_401k_accounts,
+            "NO ROTH 401K",
         ),
         "hsa_summary": (
-            str(get_summary_of_hsa_accounts())
-            if user_data.HSA_ACCOUNTS
-            else "NO HSA ACCOUNTS"
+            portfolio.hsa_accounts,
+            get_summary_of_hsa_accounts,
+            "NO HSA ACCOUNTS",
         ),
         "other_accounts_summary": (
-            str(get_summary_of_other_accounts())
-            if user_data.OTHER_ACCOUNTS
-            else "NO OTHER ACCOUNTS"
+            portfolio.other_accounts,
+            get_summary_of_other_accounts.rendered,
+            "NO OTHER ACCOUNTS",
         ),
     }
+
+    # Quote snapshot: the union of the tickers is resolved once and shared by
+    # every asset summary, so the prices are consistent across the answer. The
+    # lookup is the only call that waits on the network, so it runs in a worker
+    # thread, with a copy of the context to see the request's portfolio, while the
+    # local summaries are built. The asset summaries are then computed in order
+    # from the snapshot: that is CPU work, which more threads would not speed up.
+    asset_accounts = [sections[key][0] for key in ASSET_SUMMARY_SECTIONS]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        quote_lookup = (
+            executor.submit(
+                contextvars.copy_context().run, get_quote_snapshot, *asset_accounts
+            )
+            if any(asset_accounts)
+            else None
+        )
+
+        summaries = {
+            "user_details": str(anonymize_user_personal_details(portfolio.user_details))
+        }
+        for key, (accounts, build_summary, placeholder) in sections.items():
+            if not accounts:
+                summaries[key] = placeholder
+            elif key not in ASSET_SUMMARY_SECTIONS:
+                # Computed locally from the accounts, and rendered by the builder
+                summaries[key] = build_summary()
+
+    for key in ASSET_SUMMARY_SECTIONS:
+        accounts, build_summary, _ = sections[key]
+        if accounts:
+            summaries[key] = str(build_summary(quote_lookup.result()))
+
+    # Same key order as the sections
+    return {key: summaries[key] for key in ("user_details", *sections)}
@@ -1,4 +1,10 @@
+from chatbot import PROMPT_CACHE
 from main import app
 
+# Create the prompt cache when the worker boots rather than on its first chat;
+# importing `main` alone (tests, scripts, the dev server) makes no network call.
+if PROMPT_CACHE:
+    PROMPT_CACHE.start()
+
 # Gunicorn will look for 'application' by default:
 application = app